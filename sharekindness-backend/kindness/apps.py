@@ -0,0 +1,24 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+
+class KindnessConfig(AppConfig):
+    name = 'kindness'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .expiry import start_sweeper
+        from .metrics import install_query_timer
+        from .querycheck import install_query_recorder
+        from .revocation import start_pruner
+        from .search import ensure_search_index
+
+        post_migrate.connect(ensure_search_index, sender=self)
+        if settings.METRICS['ENABLED']:
+            connection_created.connect(install_query_timer)
+        if settings.QUERY_INSPECTION['MODE']:
+            connection_created.connect(install_query_recorder)
+        start_sweeper()
+        start_pruner()
@@ -0,0 +1,151 @@
+"""
+JWT authentication that resolves users from a per-process cache.
+
+Tokens carry the user's ``token_version``, which ChangePasswordView bumps, so
+changing the password revokes every token issued before. Resolved users are
+cached by ``(user id, token version)`` for ``AUTH_USER_CACHE['TTL']`` seconds,
+saving the user SELECT on most requests. Saves and deletes of a user clear its
+entries in the process that made them. Other processes keep serving the cached
+user, and accepting its tokens even if their version has since been revoked,
+for up to the TTL.
+
+Cached users are therefore read-only: views that change the requesting user
+re-read and lock it with ``lock_current_user``, which also rejects revoked
+tokens, and never save ``request.user`` itself.
+
+The denormalized counters change on every request status transition and are
+left out of the cache; they are deferred on cached users and loaded on access.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import router, transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .revocation import revocation_filter
+
+TOKEN_VERSION_CLAIM = 'token_version'
+
+
+class VersionedRefreshToken(RefreshToken):
+    """
+    Refresh token carrying ``token_version``; access tokens made from it inherit
+    the claim. The blacklist is only queried for tokens the revocation filter
+    may contain.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+    def check_blacklist(self):
+        if revocation_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+
+class VersionedTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = VersionedRefreshToken
+
+
+class VersionedTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = VersionedRefreshToken
+
+
+class UserCache:
+    """Thread-safe, size-bounded LRU of user field values with a per-entry TTL."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (user_id, token_version) -> (expires_at, values)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, values):
+        options = settings.AUTH_USER_CACHE
+        with self._lock:
+            self._entries[key] = (time.monotonic() + options['TTL'], values)
+            self._entries.move_to_end(key)
+            while len(self._entries) > options['MAX_SIZE']:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Drop every cached version of ``user_id`` once the current transaction commits."""
+        transaction.on_commit(lambda: self._drop(str(user_id)))
+
+    def _drop(self, user_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication with token versions and the per-process user cache."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+        token_version = validated_token.get(TOKEN_VERSION_CLAIM, 0)
+        key = (str(user_id), token_version)
+
+        fields = self.cached_fields()
+        values = user_cache.get(key)
+        if values is not None:
+            return self.user_model.from_db(
+                router.db_for_read(self.user_model), [field.attname for field in fields], values
+            )
+
+        user = super().get_user(validated_token)  # Also rejects inactive users
+        if user.token_version != token_version:
+            raise AuthenticationFailed("Token has been revoked.", code="token_revoked")
+        user_cache.set(key, tuple(getattr(user, field.attname) for field in fields))
+        return user
+
+    def cached_fields(self):
+        counters = set(getattr(self.user_model, 'COUNTER_FIELDS', ()))
+        return [field for field in self.user_model._meta.concrete_fields if field.name not in counters]
+
+
+def lock_current_user(request):
+    """
+    The requesting user, re-read and locked with SELECT ... FOR UPDATE; call it
+    inside ``transaction.atomic()``. Raises AuthenticationFailed (401) if the
+    user is gone or the request's token version has been revoked, which a
+    cached user in this process may not know yet.
+    """
+    user = request.user._meta.model.objects.select_for_update().filter(pk=request.user.pk).first()
+    token_version = request.auth.get(TOKEN_VERSION_CLAIM, 0) if request.auth is not None else None
+    if user is None or (token_version is not None and user.token_version != token_version):
+        raise AuthenticationFailed("Token has been revoked.", code="token_revoked")
+    return user
+
+
+def issue_tokens(user):
+    """``{"access", "refresh"}`` for ``user``, as returned by the login endpoint."""
+    refresh = VersionedRefreshToken.for_user(user)
+    return {"access": str(refresh.access_token), "refresh": str(refresh)}
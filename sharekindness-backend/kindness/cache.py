@@ -0,0 +1,116 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+class CacheStats:
+    """Thread-safe per-process hit/miss/invalidation counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+            }
+
+
+class DashboardCache:
+    """
+    Per-user cache of the UserDashboardView payload.
+
+    Every user has a version key; the payload is stored under the current version.
+    Invalidation bumps the version instead of deleting the payload, so a reader
+    that started building before a write can only ever store its result under the
+    old, already unreachable version.
+    """
+    key_prefix = 'dashboard'
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    @property
+    def cache(self):
+        return caches[settings.DASHBOARD_CACHE_ALIAS]
+
+    def version_key(self, user_id):
+        return f'{self.key_prefix}:version:{user_id}'
+
+    def payload_key(self, user_id, version):
+        return f'{self.key_prefix}:{user_id}:{version}'
+
+    def get_version(self, user_id):
+        key = self.version_key(user_id)
+        version = self.cache.get(key)
+        if version is None:
+            # Start from a fresh value so an evicted version never resurrects old payloads.
+            self.cache.add(key, time.time_ns(), timeout=None)
+            version = self.cache.get(key)
+        return version
+
+    def get_or_build(self, user_id, build):
+        """Return ``(payload, hit)``, calling ``build()`` on a miss."""
+        version = self.get_version(user_id)
+        key = self.payload_key(user_id, version)
+        payload = self.cache.get(key)
+        if payload is not None:
+            self.stats.incr('hits')
+            return payload, True
+
+        self.stats.incr('misses')
+        payload = build()
+        self.cache.set(key, payload, timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+        return payload, False
+
+    async def aget_version(self, user_id):
+        key = self.version_key(user_id)
+        version = await self.cache.aget(key)
+        if version is None:
+            await self.cache.aadd(key, time.time_ns(), timeout=None)
+            version = await self.cache.aget(key)
+        return version
+
+    async def aget_or_build(self, user_id, build):
+        """``get_or_build`` for async views; ``build`` is a coroutine function."""
+        version = await self.aget_version(user_id)
+        key = self.payload_key(user_id, version)
+        payload = await self.cache.aget(key)
+        if payload is not None:
+            self.stats.incr('hits')
+            return payload, True
+
+        self.stats.incr('misses')
+        payload = await build()
+        await self.cache.aset(key, payload, timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+        return payload, False
+
+    def invalidate(self, user_ids):
+        """Bump the version of every user in ``user_ids`` once the current transaction commits."""
+        user_ids = {user_id for user_id in user_ids if user_id is not None}
+        if user_ids:
+            transaction.on_commit(lambda: self._bump(user_ids))
+
+    def _bump(self, user_ids):
+        for user_id in user_ids:
+            key = self.version_key(user_id)
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, time.time_ns(), timeout=None)
+        self.stats.incr('invalidations', len(user_ids))
+
+
+dashboard_cache = DashboardCache()
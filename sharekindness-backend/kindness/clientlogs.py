@@ -0,0 +1,55 @@
+"""
+Ingestion of log events sent by the frontend.
+
+LogView (one message) and LogBatchView (a list of structured events) sample
+events by level with ``CLIENT_LOGS['SAMPLE_RATES']`` and log the rest on the
+``kindness.client`` logger. Its handler (see ``LOGGING``) is a
+kindness.logs.BackgroundFileHandler: records are put on a bounded queue and a
+background thread formats them and writes them to a size-rotated file, so
+requests never wait on the disk.
+"""
+import json
+import logging
+import random
+
+from django.conf import settings
+
+LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+    'critical': logging.CRITICAL,
+}
+
+client_logger = logging.getLogger('kindness.client')
+
+
+class JSONArgument:
+    """Serializes its value when the record is formatted, i.e. in the writer thread."""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return json.dumps(self.value, default=str, separators=(',', ':'))
+
+
+def ingest(events, user_id=None):
+    """
+    Log ``events`` (dicts with ``level``, ``message`` and optionally ``source``,
+    ``timestamp`` and ``context``) that pass sampling. Returns how many were logged.
+    """
+    rates = settings.CLIENT_LOGS['SAMPLE_RATES']
+    logged = 0
+    for event in events:
+        level = event['level']
+        if not client_logger.isEnabledFor(LEVELS[level]) or random.random() >= rates.get(level, 1.0):
+            continue
+        client_logger.log(
+            LEVELS[level], "%s user=%s source=%s client_time=%s context=%s", event['message'], user_id,
+            event.get('source') or '-', event.get('timestamp') or '-', JSONArgument(event.get('context') or {}),
+        )
+        logged += 1
+    return logged
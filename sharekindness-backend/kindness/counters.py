@@ -0,0 +1,81 @@
+"""
+Denormalized request counters.
+
+``User.pending_incoming_requests`` counts PENDING requests on the user's
+donations; ``User.pending_outgoing_requests`` counts PENDING requests the user
+made. ``Donation.admitted_requests`` counts all requests on a donation and
+enforces ``Donation.MAX_REQUESTS``. All are adjusted with F() expressions so
+concurrent writers never lose an update, and are rebuilt from the source tables
+by the ``rebuild_request_counters`` command.
+"""
+from collections import Counter
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Donation, Request, User
+
+
+def donor_id_for(request_obj):
+    """The donor of ``request_obj``'s donation, without loading the donation if possible."""
+    if type(request_obj).donation.is_cached(request_obj):
+        return request_obj.donation.donor_id
+    return Donation.objects.filter(pk=request_obj.donation_id).values_list('donor_id', flat=True).first()
+
+
+def adjust_pending_counters(pairs, delta):
+    """
+    Add ``delta`` to the counters for each ``(requester_id, donor_id)`` pair,
+    issuing one UPDATE per distinct user and counter.
+    """
+    pairs = list(pairs)
+    outgoing = Counter(requester_id for requester_id, _ in pairs)
+    incoming = Counter(donor_id for _, donor_id in pairs if donor_id is not None)
+    for user_id, count in outgoing.items():
+        User.objects.filter(pk=user_id).update(
+            pending_outgoing_requests=F('pending_outgoing_requests') + delta * count
+        )
+    for user_id, count in incoming.items():
+        User.objects.filter(pk=user_id).update(
+            pending_incoming_requests=F('pending_incoming_requests') + delta * count
+        )
+
+
+def rebuild_pending_counters(user_model=User, request_model=Request):
+    """Recompute every counter from the Request table. Returns the number of users updated."""
+
+    def pending_count(**lookup):
+        counts = (
+            request_model.objects.filter(status='PENDING', **lookup)
+            .order_by()
+            .values(*lookup)
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    return user_model.objects.update(
+        pending_incoming_requests=pending_count(donation__donor=OuterRef('pk')),
+        pending_outgoing_requests=pending_count(user=OuterRef('pk')),
+    )
+
+
+def release_admission(donation_id):
+    """Give back the slot of a deleted request."""
+    Donation.objects.filter(pk=donation_id, admitted_requests__gt=0).update(
+        admitted_requests=F('admitted_requests') - 1
+    )
+
+
+def rebuild_admitted_requests(donation_model=Donation, request_model=Request):
+    """Recompute ``admitted_requests`` for every donation. Returns the number of donations updated."""
+    counts = (
+        request_model.objects.filter(donation=OuterRef('pk'))
+        .order_by()
+        .values('donation')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return donation_model.objects.update(
+        admitted_requests=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+    )
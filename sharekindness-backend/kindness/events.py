@@ -0,0 +1,140 @@
+"""
+Per-user event pub/sub behind the server-sent events stream.
+
+Views and signal receivers call ``publish()``; ``EventStreamView`` subscribes
+for the connected user. The broker is chosen by ``settings.EVENT_BROKER`` so the
+in-process implementation can be swapped for one backed by Redis or PostgreSQL
+LISTEN/NOTIFY when running more than one worker process.
+"""
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class BaseBroker:
+    """Interface every event broker implements."""
+
+    def publish(self, user_id, event):
+        """Deliver ``event`` (a JSON-serializable dict) to every subscriber of ``user_id``."""
+        raise NotImplementedError
+
+    def subscribe(self, user_id):
+        """Return a ``Subscription`` for ``user_id``; must be called from the event loop."""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class Subscription:
+    """A single connected client. Events are buffered in a bounded asyncio queue."""
+
+    def __init__(self, broker, user_id, max_pending):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_pending)
+
+    def deliver(self, event):
+        """Thread-safe: hand ``event`` to the subscriber's event loop."""
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A stalled client must not grow memory without bound; it can
+            # resynchronise from /api/user-notifications/ on reconnect.
+            logger.warning("Dropping event for slow subscriber of user %s", self.user_id)
+
+    async def get(self, timeout):
+        """Next event, or ``None`` if nothing arrives within ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker(BaseBroker):
+    """
+    Fan-out within one process. Only suitable for a single ASGI worker, or when
+    each user is pinned to a worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # The subscriber's event loop has already shut down.
+                self.unsubscribe(subscription)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id, settings.EVENT_STREAM['MAX_PENDING_EVENTS'])
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.EVENT_BROKER)()
+    return _broker
+
+
+def publish(user_ids, event):
+    """Publish ``event`` to each of ``user_ids`` once the current transaction commits."""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+
+    def send():
+        broker = get_broker()
+        for user_id in user_ids:
+            broker.publish(user_id, event)
+
+    transaction.on_commit(send)
+
+
+def request_event(event_type, request_id, donation_id, status):
+    return {
+        'type': event_type,
+        'request_id': request_id,
+        'donation_id': donation_id,
+        'status': status,
+    }
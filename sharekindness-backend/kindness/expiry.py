@@ -0,0 +1,90 @@
+"""
+Expiry of stale donations.
+
+AVAILABLE donations older than ``DONATION_EXPIRY['MAX_AGE_DAYS']`` (or the
+shorter age of their category in ``CATEGORY_MAX_AGE_DAYS``) are marked EXPIRED
+and their PENDING requests rejected, which keeps the AVAILABLE set that every
+list and search scans small. Sweeps run from the ``expire_donations`` command or
+from an in-process thread when ``DONATION_EXPIRY['INTERVAL']`` is set.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import periodic
+from .cache import dashboard_cache
+from .counters import adjust_pending_counters
+from .events import publish, request_event
+from .models import Donation, Request
+
+logger = logging.getLogger(__name__)
+
+
+def stale_querysets(now=None):
+    """
+    One queryset per expiry policy, each served by a (status, ..., created_at, id)
+    index: per-category ages first, then the default age for every other category.
+    """
+    options = settings.DONATION_EXPIRY
+    now = now or timezone.now()
+    available = Donation.objects.filter(status='AVAILABLE')
+    category_ages = options['CATEGORY_MAX_AGE_DAYS']
+    querysets = [
+        available.filter(category=category, created_at__lt=now - timedelta(days=days))
+        for category, days in category_ages.items()
+    ]
+    querysets.append(
+        available.filter(created_at__lt=now - timedelta(days=options['MAX_AGE_DAYS']))
+        .exclude(category__in=list(category_ages))
+    )
+    return [queryset.order_by('created_at', 'id') for queryset in querysets]
+
+
+def expire_stale_donations(now=None, batch_size=None):
+    """
+    Expire every stale donation in batches of ``batch_size``, one transaction per
+    batch. Returns ``(donations expired, requests rejected)``.
+    """
+    batch_size = batch_size or settings.DONATION_EXPIRY['BATCH_SIZE']
+    expired = rejected = 0
+    for queryset in stale_querysets(now):
+        while True:
+            with transaction.atomic():
+                # Rows another sweeper or a moderator holds are left for the next pass.
+                donation_ids = list(
+                    queryset.select_for_update(skip_locked=True).values_list('pk', flat=True)[:batch_size]
+                )
+                if not donation_ids:
+                    break
+                rejected += expire_batch(donation_ids)
+            expired += len(donation_ids)
+            if len(donation_ids) < batch_size:
+                break
+    if expired:
+        logger.info("Expired %s donations and rejected %s pending requests", expired, rejected)
+    return expired, rejected
+
+
+def expire_batch(donation_ids):
+    """Mark ``donation_ids`` EXPIRED and reject their PENDING requests. Returns the number rejected."""
+    now = timezone.now()
+    Donation.objects.filter(pk__in=donation_ids).update(status='EXPIRED', updated_at=now)
+    pending = Request.objects.filter(donation_id__in=donation_ids, status='PENDING')
+    rows = list(pending.values_list('id', 'user_id', 'donation_id', 'donation__donor_id'))
+    pending.update(status='REJECTED', updated_at=now)
+
+    # Bulk updates bypass the post_save signals
+    adjust_pending_counters([(user_id, donor_id) for _, user_id, _, donor_id in rows], -1)
+    donor_ids = Donation.objects.filter(pk__in=donation_ids).values_list('donor_id', flat=True)
+    dashboard_cache.invalidate(set(donor_ids) | {user_id for _, user_id, _, _ in rows})
+    for request_id, user_id, donation_id, _ in rows:
+        publish([user_id], request_event('request.rejected', request_id, donation_id, 'REJECTED'))
+    return len(rows)
+
+
+def start_sweeper():
+    """Start the in-process sweeper once per process if ``DONATION_EXPIRY['INTERVAL']`` is set."""
+    return periodic.start_sweeper('donation-expiry', expire_stale_donations, settings.DONATION_EXPIRY['INTERVAL'])
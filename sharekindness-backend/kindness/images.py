@@ -0,0 +1,146 @@
+"""
+Resized derivatives of uploaded donation images and profile pictures.
+
+After an upload is committed, a worker thread decodes the original once, applies
+its EXIF orientation, and writes every size in ``IMAGE_PIPELINE['VARIANTS']``
+in every format in ``IMAGE_PIPELINE['FORMATS']``. Derivatives are re-encoded
+from pixel data only, so EXIF/GPS and other metadata never reach them. Their
+storage names are recorded on the model so serializers can expose URLs.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .storage import save_files
+
+logger = logging.getLogger(__name__)
+
+PIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PIPELINE['WORKERS'], thread_name_prefix='image-pipeline'
+        )
+    return _executor
+
+
+def variants_are_current(field_file, variants):
+    return not field_file or variants.get('source') == field_file.name
+
+
+def schedule_derivatives(instance, image_field, variants_field, on_done=None):
+    """
+    Queue derivative generation for ``instance.<image_field>`` after the current
+    transaction commits, unless the recorded variants already match it.
+    """
+    field_file = getattr(instance, image_field)
+    if variants_are_current(field_file, getattr(instance, variants_field)):
+        return
+    job = (type(instance), instance.pk, image_field, variants_field, field_file.name, on_done)
+    if settings.IMAGE_PIPELINE['ASYNC']:
+        transaction.on_commit(lambda: get_executor().submit(run_job, *job))
+    else:
+        transaction.on_commit(lambda: run_job(*job))
+
+
+def run_job(model, pk, image_field, variants_field, source, on_done):
+    try:
+        storage = model._meta.get_field(image_field).storage
+        variants = build_derivatives(storage, source)
+        previous = model.objects.filter(pk=pk).values_list(variants_field, flat=True).first()
+        # Only record the result if the image was not replaced in the meantime.
+        updated = model.objects.filter(pk=pk, **{image_field: source}).update(
+            **{variants_field: variants, 'updated_at': timezone.now()}
+        )
+        if not updated:
+            delete_derivatives(storage, variants)
+            return
+        if previous:
+            delete_derivatives(storage, previous)
+        if on_done is not None:
+            on_done(pk)
+    except Exception:
+        logger.exception("Failed to build image derivatives for %s %s", model.__name__, pk)
+    finally:
+        if settings.IMAGE_PIPELINE['ASYNC']:
+            close_old_connections()
+
+
+def build_derivatives(storage, source):
+    """Write every configured derivative of ``source`` and return their storage names."""
+    options = settings.IMAGE_PIPELINE
+    with storage.open(source, 'rb') as original:
+        image = Image.open(original)
+        largest = max(options['VARIANTS'].values())
+        # Let the JPEG decoder downscale while decoding instead of afterwards.
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    directory, filename = os.path.split(source)
+    stem = os.path.splitext(filename)[0]
+    variants = {'source': source, 'variants': {}}
+    files = []  # ((variant, format), (path, content)), stored in one batch below
+    # Largest first, so each size is resampled from the previous, smaller, one.
+    for name, max_size in sorted(options['VARIANTS'].items(), key=lambda item: -item[1]):
+        image = image.copy()
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+        variants['variants'][name] = {'width': image.width, 'height': image.height}
+        for fmt, quality in options['FORMATS'].items():
+            path = os.path.join(directory, 'variants', f'{stem}_{name}.{fmt}')
+            files.append(((name, fmt), (path, ContentFile(encode(image, fmt, quality)))))
+    stored = save_files(storage, [file for _, file in files])
+    for ((name, fmt), _), stored_name in zip(files, stored):
+        variants['variants'][name][fmt] = stored_name
+    return variants
+
+
+def encode(image, fmt, quality):
+    if fmt == 'jpeg' and image.mode == 'RGBA':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = io.BytesIO()
+    # No exif/icc_profile arguments: the output carries pixels only.
+    image.save(buffer, PIL_FORMATS[fmt], quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def delete_derivatives(storage, variants):
+    for entry in (variants or {}).get('variants', {}).values():
+        for fmt in PIL_FORMATS:
+            if entry.get(fmt):
+                storage.delete(entry[fmt])
+
+
+def variant_urls(field_file, variants, request=None):
+    """
+    ``{size: {format: url, 'width': w, 'height': h}}`` for the current image, or
+    ``None`` while its derivatives are still being generated.
+    """
+    if not field_file or not variants_are_current(field_file, variants):
+        return None
+    storage = field_file.storage
+    urls = {}
+    for name, entry in variants['variants'].items():
+        urls[name] = {'width': entry['width'], 'height': entry['height']}
+        for fmt in PIL_FORMATS:
+            if entry.get(fmt):
+                url = storage.url(entry[fmt])
+                urls[name][fmt] = request.build_absolute_uri(url) if request is not None else url
+    return urls
@@ -0,0 +1,213 @@
+"""
+Logging pipeline: request IDs, JSON records and handlers off the request path.
+
+- RequestIDMiddleware gives every request an ID, taken from a well-formed
+  ``X-Request-ID`` header or generated, and returns it in the response.
+  RequestIDFilter adds it to every record logged while the request is handled,
+  as ``record.request_id``.
+- JSONFormatter renders a record as one JSON object per line, with the fields
+  passed in ``extra``, for ``LOG_FORMAT = 'json'``.
+- BackgroundFileHandler and BackgroundStreamHandler only put records on a
+  bounded queue. A QueueListener thread formats and writes them, so the request
+  path does not wait on the disk or the console and does not format messages.
+- ``rate_limited`` caps how often one message is logged per
+  ``LOG_RATE_LIMIT['INTERVAL']``; handle_error uses it so a flood of identical
+  errors logs a few lines and a count.
+"""
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+import orjson
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+re_request_id = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+
+current_request_id = ContextVar('current_request_id', default=None)
+
+
+class RequestIDMiddleware:
+    """Sets the request ID for the request's log records and returns it in ``X-Request-ID``."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request_id = self.start(request)
+        response = self.get_response(request)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
+
+    async def __acall__(self, request):
+        request_id = self.start(request)
+        response = await self.get_response(request)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
+
+    def start(self, request):
+        supplied = request.headers.get(REQUEST_ID_HEADER, '')
+        request_id = supplied if re_request_id.match(supplied) else uuid.uuid4().hex
+        request.id = request_id
+        # Not reset when the response is returned: Django logs error responses
+        # (django.request) after the middleware chain, and the next request of
+        # the thread, or the next ASGI task, sets its own.
+        current_request_id.set(request_id)
+        return request_id
+
+
+class RequestIDFilter(logging.Filter):
+    """Adds ``request_id`` (or ``'-'`` outside requests) to records, in the thread that logs them."""
+
+    def filter(self, record):
+        record.request_id = current_request_id.get() or '-'
+        return True
+
+
+# Attributes of every LogRecord; anything else on a record came from ``extra``
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, request_id, extras and exception."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    Queues records for ``self.target``, written by a QueueListener thread
+    started on the first record. Records are queued unformatted, so their
+    arguments must not change after logging. When the queue is full, records
+    are dropped and counted rather than blocking the caller.
+    """
+
+    def __init__(self, target, capacity=10000):
+        super().__init__(queue.Queue(capacity))
+        self.target = target
+        self.listener = None
+        self.dropped = 0  # Records lost to a full queue
+        self._start_lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        if self.listener is None:
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        with self._start_lock:
+            if self.listener is None:
+                listener = QueueListener(self.queue, self.target)
+                listener.start()
+                self.listener = listener
+
+    def close(self):
+        # Called by logging.shutdown() at exit: write out what is queued.
+        with self._start_lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+        self.target.close()
+        super().close()
+
+
+class BackgroundFileHandler(BackgroundHandler):
+    """A RotatingFileHandler written from a background thread."""
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, capacity=10000, encoding='utf-8'):
+        target = RotatingFileHandler(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding, delay=True)
+        super().__init__(target, capacity)
+
+
+class BackgroundStreamHandler(BackgroundHandler):
+    """A StreamHandler on stderr (or ``'ext://sys.stdout'``) written from a background thread."""
+
+    def __init__(self, stream=None, capacity=10000):
+        super().__init__(logging.StreamHandler(stream or sys.stderr), capacity)
+
+
+class RateLimiter:
+    """At most ``LOG_RATE_LIMIT['PER_INTERVAL']`` hits per key and interval, counting the rest."""
+    max_keys = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows = OrderedDict()  # key -> [window start, hits, suppressed]
+
+    def hit(self, key):
+        """``(allowed, suppressed)``: whether to log, and how many were suppressed since the last allowed hit."""
+        options = settings.LOG_RATE_LIMIT
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= options['INTERVAL']:
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+                self._windows.move_to_end(key)
+                if len(self._windows) > self.max_keys:
+                    self._windows.popitem(last=False)
+                return True, suppressed
+            if window[1] < options['PER_INTERVAL']:
+                window[1] += 1
+                suppressed, window[2] = window[2], 0
+                return True, suppressed
+            window[2] += 1
+            return False, 0
+
+
+rate_limiter = RateLimiter()
+
+
+def rate_limited(logger, level, key, msg, *args):
+    """Log ``msg % args`` unless ``key`` is over its rate; a logged line reports how many were skipped."""
+    if not logger.isEnabledFor(level):
+        return
+    allowed, suppressed = rate_limiter.hit(key)
+    if not allowed:
+        return
+    # stacklevel: attribute the record to the caller of rate_limited's caller, e.g. a view
+    if suppressed:
+        logger.log(level, msg + " (%d similar messages suppressed)", *args, suppressed, stacklevel=3)
+    else:
+        logger.log(level, msg, *args, stacklevel=3)
@@ -0,0 +1,182 @@
+import asyncio
+import io
+import time
+import types
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import path
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from kindness.models import Donation, Request, User
+from kindness.views.base import read_view
+from kindness.views.donations import (
+    AsyncDonationDetailView, AsyncDonationListView, DonationDetailView, DonationListCreateView,
+)
+from kindness.views.user import (
+    AsyncUserDashboardView, AsyncUserNotificationView, AsyncUserProfileView,
+    UserDashboardView, UserNotificationView, UserProfileView,
+)
+
+HOST = "localhost"
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the read endpoints in-process with simulated slow clients and compare throughput "
+        "of the sync views under WSGI, the sync views under ASGI and the async views under ASGI."
+    )
+
+    # (url, sync view, async view)
+    ENDPOINTS = [
+        ("donations/", DonationListCreateView, AsyncDonationListView),
+        ("donations/<int:pk>/", DonationDetailView, AsyncDonationDetailView),
+        ("user-dashboard/", UserDashboardView, AsyncUserDashboardView),
+        ("user-notifications/", UserNotificationView, AsyncUserNotificationView),
+        ("user/profile/", UserProfileView, AsyncUserProfileView),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=50, help="Concurrent clients.")
+        parser.add_argument("--requests", type=int, default=10, help="Requests per client.")
+        parser.add_argument(
+            "--threads", type=int, default=8,
+            help="Request threads of the WSGI worker; ASGI runs one event loop in the same single process.",
+        )
+        parser.add_argument(
+            "--client-delay", type=float, default=50,
+            help="Milliseconds each client takes to read its response, holding the connection.",
+        )
+        parser.add_argument("--donations", type=int, default=50, help="Donations to seed.")
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        user = User.objects.create(username=f"bench-{run}", email=f"bench-{run}@example.com")
+        other = User.objects.create(username=f"bench-other-{run}", email=f"bench-other-{run}@example.com")
+        try:
+            donation = None
+            for i in range(options["donations"]):
+                donation = Donation.objects.create(
+                    donor=user if i % 2 else other, item_name=f"Bench {i}", description="Synthetic", category="BOOKS"
+                )
+                Request.objects.create(user=other if i % 2 else user, donation=donation)
+            token = str(RefreshToken.for_user(user).access_token)
+            paths = [f"/{url.replace('<int:pk>', str(donation.pk))}" for url, _, _ in self.ENDPOINTS]
+
+            # Measure the database paths rather than dashboard cache hits.
+            dummy_cache = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+            with override_settings(
+                CACHES={**settings.CACHES, "bench": dummy_cache},
+                DASHBOARD_CACHE_ALIAS="bench",
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, HOST],
+            ):
+                results = [
+                    ("wsgi, sync views", self.bench_wsgi(self.urlconf(False), paths, token, options)),
+                    ("asgi, sync views", self.bench_asgi(self.urlconf(False), paths, token, options)),
+                    ("asgi, async views", self.bench_asgi(self.urlconf(True), paths, token, options)),
+                ]
+        finally:
+            User.objects.filter(pk__in=[user.pk, other.pk]).delete()
+
+        total = options["clients"] * options["requests"]
+        for name, (elapsed, failures) in results:
+            line = f"{name:<18} {total / elapsed:>8.1f} req/s  ({total} requests in {elapsed:.2f} s)"
+            self.stdout.write(self.style.ERROR(line) if failures else self.style.SUCCESS(line))
+            for failure in failures[:3]:
+                self.stdout.write(f"  {failure}")
+        if any(failures for _, (_, failures) in results):
+            raise CommandError("Some requests failed.")
+
+    def urlconf(self, async_reads):
+        with override_settings(ASYNC_READ_VIEWS=async_reads):
+            patterns = [path(url, read_view(view, async_view)) for url, view, async_view in self.ENDPOINTS]
+        urlconf = types.ModuleType(f"bench_urls_{'async' if async_reads else 'sync'}")
+        urlconf.urlpatterns = patterns
+        return urlconf
+
+    def bench_wsgi(self, urlconf, paths, token, options):
+        """Every request holds one of ``--threads`` threads until its client has read the response."""
+        delay = options["client_delay"] / 1000
+        failures = []
+
+        def call(path_info):
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": path_info,
+                "QUERY_STRING": "",
+                "SERVER_NAME": HOST,
+                "HTTP_HOST": HOST,
+                "HTTP_AUTHORIZATION": f"Bearer {token}",
+                "wsgi.input": io.BytesIO(),
+            }
+            setup_testing_defaults(environ)
+            statuses = []
+            body = b"".join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+            time.sleep(delay)  # The slow client reading the response
+            if not statuses[0].startswith("200"):
+                failures.append(f"{path_info}: {statuses[0]} {body[:200]!r}")
+
+        with override_settings(ROOT_URLCONF=urlconf):
+            application = WSGIHandler()
+            calls = [paths[i % len(paths)] for i in range(options["clients"] * options["requests"])]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+                list(pool.map(call, calls))
+            return time.perf_counter() - started, failures
+
+    def bench_asgi(self, urlconf, paths, token, options):
+        """A slow client only holds a suspended coroutine."""
+        delay = options["client_delay"] / 1000
+        failures = []
+
+        async def call(application, path_info):
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path_info,
+                "raw_path": path_info.encode(),
+                "query_string": b"",
+                "headers": [(b"host", HOST.encode()), (b"authorization", f"Bearer {token}".encode())],
+                "server": (HOST, 80),
+                "client": ("127.0.0.1", 50000),
+            }
+            received = asyncio.Event()
+            messages = []
+
+            async def receive():
+                if received.is_set():
+                    await asyncio.Event().wait()  # No disconnect until the response is sent
+                received.set()
+                return {"type": "http.request", "body": b"", "more_body": False}
+
+            async def send(message):
+                messages.append(message)
+                if message["type"] == "http.response.body" and not message.get("more_body"):
+                    await asyncio.sleep(delay)  # The slow client reading the response
+
+            await application(scope, receive, send)
+            if messages[0]["status"] != 200:
+                body = b"".join(m.get("body", b"") for m in messages[1:])
+                failures.append(f"{path_info}: {messages[0]['status']} {body[:200]!r}")
+
+        async def client(application, offset):
+            for i in range(options["requests"]):
+                await call(application, paths[(offset + i) % len(paths)])
+
+        async def main():
+            application = ASGIHandler()
+            started = time.perf_counter()
+            await asyncio.gather(*(client(application, c) for c in range(options["clients"])))
+            return time.perf_counter() - started
+
+        with override_settings(ROOT_URLCONF=urlconf):
+            return asyncio.run(main()), failures
@@ -0,0 +1,88 @@
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from kindness.models import Donation, Request, User
+from kindness.views.requests import RequestListCreateView
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent requests for one donation from many users and verify that no more "
+        "than Donation.MAX_REQUESTS are admitted and that the admission counter matches the rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20, help="Concurrent requesters.")
+        parser.add_argument("--rounds", type=int, default=5, help="Donations to contend over, one after another.")
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        donor = User.objects.create(username=f"bench-donor-{run}", email=f"bench-donor-{run}@example.com")
+        users = [
+            User.objects.create(username=f"bench-{run}-{i}", email=f"bench-{run}-{i}@example.com")
+            for i in range(options["users"])
+        ]
+        failures = []
+        try:
+            for round_number in range(options["rounds"]):
+                donation = Donation.objects.create(
+                    donor=donor, item_name=f"Bench {round_number}", description="Synthetic",
+                    category="BOOKS", quantity=1,
+                )
+                statuses, errors, elapsed = self.contend(donation, users)
+                donation.refresh_from_db()
+                admitted = Request.objects.filter(donation=donation).count()
+                line = (
+                    f"round {round_number}: {statuses.get(201, 0)} admitted, "
+                    f"{statuses.get(400, 0)} refused, {len(errors)} errors in {elapsed * 1000:.0f} ms; "
+                    f"rows={admitted} counter={donation.admitted_requests} status={donation.status}"
+                )
+                if admitted > Donation.MAX_REQUESTS or admitted != donation.admitted_requests or errors:
+                    failures.append(round_number)
+                    self.stdout.write(self.style.ERROR(line))
+                    for error in errors[:3]:
+                        self.stdout.write(f"  {error}")
+                else:
+                    self.stdout.write(self.style.SUCCESS(line))
+        finally:
+            # Deleting the users cascades to their donations and requests.
+            User.objects.filter(pk__in=[donor.pk] + [user.pk for user in users]).delete()
+
+        if failures:
+            raise CommandError(f"Admission invariant violated in rounds: {failures}")
+
+    def contend(self, donation, users):
+        """Submit one request per user at the same moment; return (status counts, errors, seconds)."""
+        factory = APIRequestFactory()
+        barrier = threading.Barrier(len(users))
+        lock = threading.Lock()
+        statuses, errors = {}, []
+
+        def submit(user):
+            request = factory.post(
+                "/api/requests/", {"donation": donation.pk, "requested_quantity": 1}, format="json"
+            )
+            force_authenticate(request, user=user)
+            try:
+                barrier.wait()
+                response = RequestListCreateView.as_view()(request)
+                with lock:
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=submit, args=(user,)) for user in users]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses, errors, time.perf_counter() - started
@@ -0,0 +1,104 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from kindness.middleware import brotli
+from kindness.models import Donation, Request, User
+from kindness.renderers import ORJSONRenderer
+from kindness.views.user import UserDashboardView
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Build a dashboard payload of synthetic rows inside a rolled-back transaction and "
+        "measure serializer, JSON renderer and compression throughput on it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--donations", type=int, default=50, help="Donations on the dashboard.")
+        parser.add_argument("--requests", type=int, default=5, help="Requests per donation.")
+        parser.add_argument("--repeat", type=int, default=50, help="Timed repetitions of each step.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def run(self, options):
+        user = self.seed(options["donations"], options["requests"])
+        request = APIRequestFactory().get("/api/user-dashboard/")
+        request.user = user
+        donations, requests = UserDashboardView.dashboard_querysets(user)
+        donations, requests = list(donations), list(requests)
+        repeat = options["repeat"]
+
+        serialize = self.timed(repeat, lambda: UserDashboardView.serialize_dashboard(request, donations, requests))
+        data = UserDashboardView.serialize_dashboard(request, donations, requests)
+        body = JSONRenderer().render(data)
+        self.stdout.write(
+            f"payload: {options['donations']} donations x {options['requests']} requests, {len(body) / 1024:.1f} KiB JSON"
+        )
+        self.report("serializers (to Python data)", serialize, len(body))
+
+        for name, renderer in (("JSONRenderer", JSONRenderer()), ("ORJSONRenderer", ORJSONRenderer())):
+            self.report(f"render, {name}", self.timed(repeat, lambda: renderer.render(data)), len(body))
+
+        gzip_size = len(compress_string(body))
+        self.report(
+            f"gzip ({gzip_size / 1024:.1f} KiB, {gzip_size / len(body):.0%})",
+            self.timed(repeat, lambda: compress_string(body)), len(body),
+        )
+        if brotli is not None:
+            br_size = len(brotli.compress(body, quality=5))
+            self.report(
+                f"brotli q5 ({br_size / 1024:.1f} KiB, {br_size / len(body):.0%})",
+                self.timed(repeat, lambda: brotli.compress(body, quality=5)), len(body),
+            )
+        else:
+            self.stdout.write("brotli: not installed, skipped")
+
+    def timed(self, repeat, func):
+        """Mean seconds per call of ``func`` over ``repeat`` calls, after one warm-up call."""
+        func()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - started) / repeat
+
+    def report(self, name, seconds, size):
+        self.stdout.write(
+            f"{name:<36} {seconds * 1000:>8.2f} ms/payload {size / seconds / 2**20:>8.1f} MiB/s of JSON"
+        )
+
+    def seed(self, donations, requests_per_donation):
+        owner = User.objects.create(
+            username="bench-owner", email="bench-owner@example.com", bio="Synthetic profile " * 10
+        )
+        requesters = [
+            User.objects.create(username=f"bench-{i}", email=f"bench-{i}@example.com", city="Springfield")
+            for i in range(requests_per_donation)
+        ]
+        for i in range(donations):
+            donation = Donation.objects.create(
+                donor=owner, item_name=f"Item {i}", description="A synthetic donation description. " * 5,
+                category="BOOKS",
+            )
+            for requester in requesters:
+                Request.objects.create(user=requester, donation=donation, comments="Would love this, thanks!")
+            # The owner also asks for someone else's donation.
+            theirs = Donation.objects.create(
+                donor=requesters[0], item_name=f"Other {i}", description="Synthetic", category="FOOD"
+            )
+            Request.objects.create(user=owner, donation=theirs)
+        return owner
@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from kindness.models import Donation, Request, User
+from kindness.querycheck import QueryLog, query_problems
+from kindness.views.donations import DonationDetailView, DonationListCreateView
+from kindness.views.requests import RequestDetailView, RequestListCreateView
+from kindness.views.user import UserDashboardView, UserNotificationView
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic rows at two sizes inside a rolled-back transaction and verify that "
+        "the number of queries run by each read endpoint does not grow with the row count, "
+        "repeats no query shape (N+1) and stays within the view's query budget."
+    )
+
+    # (name, view, url kwargs builder)
+    ENDPOINTS = [
+        ("donation-list", DonationListCreateView, lambda ctx: {}),
+        ("donation-detail", DonationDetailView, lambda ctx: {"pk": ctx["donation"].pk}),
+        ("request-list", RequestListCreateView, lambda ctx: {}),
+        ("request-detail", RequestDetailView, lambda ctx: {"pk": ctx["request"].pk}),
+        ("user-dashboard", UserDashboardView, lambda ctx: {}),
+        ("user-notifications", UserNotificationView, lambda ctx: {}),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument("--small", type=int, default=3, help="Rows per table for the first run.")
+        parser.add_argument("--large", type=int, default=15, help="Rows per table for the second run.")
+
+    def handle(self, *args, **options):
+        # Measure the uncached code paths; the dashboard cache would otherwise hide them.
+        dummy_cache = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+        with override_settings(
+            CACHES={**settings.CACHES, "query_counts": dummy_cache},
+            DASHBOARD_CACHE_ALIAS="query_counts",
+        ):
+            small = self.measure(options["small"])
+            large = self.measure(options["large"])
+
+        failures = []
+        for name, view, _ in self.ENDPOINTS:
+            problems = query_problems(large[name], view, "GET")
+            if len(large[name]) != len(small[name]):
+                problems.insert(0, "query count grows with row count")
+            line = f"{name:<20} {len(small[name]):>4} -> {len(large[name]):>4} queries"
+            if problems:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(line))
+                for problem in problems:
+                    self.stdout.write(f"  {problem}")
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+
+        if failures:
+            raise CommandError(f"Query checks failed for: {', '.join(failures)}")
+
+    def measure(self, size):
+        """Return {endpoint name: QueryLog} for a database seeded with ``size`` rows."""
+        logs = {}
+        try:
+            with transaction.atomic():
+                ctx = self.seed(size)
+                factory = APIRequestFactory()
+                for name, view, kwargs in self.ENDPOINTS:
+                    request = factory.get("/")
+                    force_authenticate(request, user=ctx["user"])
+                    with CaptureQueriesContext(connection) as queries:
+                        response = view.as_view()(request, **kwargs(ctx))
+                    if response.status_code != 200:
+                        raise CommandError(f"{name} returned {response.status_code}: {response.data}")
+                    logs[name] = QueryLog(query["sql"] for query in queries)
+                raise _Rollback
+        except _Rollback:
+            pass
+        return logs
+
+    def seed(self, size):
+        user = User.objects.create(username="qc-owner", email="qc-owner@example.com")
+        donation = request_obj = None
+        for i in range(size):
+            other = User.objects.create(username=f"qc-{size}-{i}", email=f"qc-{size}-{i}@example.com")
+            # A donation of the owner claimed by someone else ...
+            donation = Donation.objects.create(
+                donor=user, item_name=f"Item {i}", description="Synthetic", category="BOOKS"
+            )
+            Request.objects.create(user=other, donation=donation, status="CLAIMED")
+            # ... and a donation of someone else requested by the owner.
+            theirs = Donation.objects.create(
+                donor=other, item_name=f"Other {i}", description="Synthetic", category="FOOD"
+            )
+            request_obj = Request.objects.create(user=user, donation=theirs)
+        return {"user": user, "donation": donation, "request": request_obj}
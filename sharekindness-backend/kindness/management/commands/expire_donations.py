@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from kindness.expiry import expire_stale_donations, stale_querysets
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark AVAILABLE donations past DONATION_EXPIRY's age limits as EXPIRED and reject "
+        "their pending requests."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Donations per transaction (default: DONATION_EXPIRY['BATCH_SIZE']).")
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many donations would expire.")
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            stale = sum(queryset.count() for queryset in stale_querysets())
+            self.stdout.write(f"{stale} donations would expire.")
+            return
+        expired, rejected = expire_stale_donations(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} donations and rejected {rejected} pending requests."))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from kindness.synthetic import PASSWORD, generate, synthetic_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with reproducible synthetic users, donations and requests for "
+        "run_benchmark, e.g. --users 100000 --donations 1000000 --requests 5000000. "
+        "Use a fresh database: the same seed and sizes then give the same rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Users to create.")
+        parser.add_argument("--donations", type=int, default=10000, help="Donations to create.")
+        parser.add_argument(
+            "--requests", type=int, default=50000,
+            help="Requests to create, on average; each donation takes at most Donation.MAX_REQUESTS.",
+        )
+        parser.add_argument("--images", type=int, default=12, help="Distinct images shared by donations and profiles.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+        parser.add_argument("--days", type=int, default=90, help="Spread creation dates over this many days.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per INSERT.")
+
+    def handle(self, *args, **options):
+        if options["users"] < 2 or options["donations"] < 1 or options["days"] < 1:
+            raise CommandError("Create at least 2 users and 1 donation over at least 1 day.")
+        if synthetic_users().exists():
+            raise CommandError("The database already holds synthetic data; use a fresh database.")
+
+        started = time.perf_counter()
+        counts = generate(
+            options["users"], options["donations"], options["requests"],
+            images=options["images"], seed=options["seed"], days=options["days"],
+            batch_size=options["batch_size"], progress=lambda message: self.stdout.write(f"  {message}"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['users']} users, {counts['donations']} donations, {counts['requests']} requests "
+            f"and {counts['images']} images in {time.perf_counter() - started:.1f} s. "
+            f"Every user's password is {PASSWORD!r}."
+        ))
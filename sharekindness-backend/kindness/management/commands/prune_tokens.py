@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from kindness.revocation import prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding refresh tokens and their blacklist entries in batches. "
+        "A batched replacement for simplejwt's flushexpiredtokens."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Tokens per transaction (default: TOKEN_BLACKLIST['PRUNE_BATCH_SIZE']).")
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many tokens would be deleted.")
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+            blacklisted = BlacklistedToken.objects.filter(token__in=expired).count()
+            self.stdout.write(f"{expired.count()} expired tokens ({blacklisted} blacklisted) would be deleted.")
+            return
+        pruned = prune_expired_tokens(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {pruned} expired tokens."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from kindness.uploads import purge_expired_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete resumable uploads that were started but never used within UPLOADS['EXPIRY_HOURS']."
+
+    def handle(self, *args, **options):
+        purged = purge_expired_uploads()
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} expired uploads."))
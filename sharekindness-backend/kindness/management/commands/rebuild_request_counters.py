@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from kindness.counters import rebuild_admitted_requests, rebuild_pending_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the denormalized request counters from the Request table: the per-user "
+        "pending request counts and the per-donation admitted request counts."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            users = rebuild_pending_counters()
+            donations = rebuild_admitted_requests()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt notification counters for {users} users and admission counters for {donations} donations."
+        ))
@@ -0,0 +1,503 @@
+import hashlib
+import io
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+import uuid
+from math import ceil
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Exists, OuterRef
+from django.test import Client
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import override_settings
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from PIL import Image
+
+from kindness.authentication import issue_tokens
+from kindness.models import Donation, Request, Upload, User
+from kindness.querycheck import install_query_recorder, recording
+from kindness.synthetic import PASSWORD, synthetic_users
+from kindness.uploads import create_part_file, discard
+
+# Routes of kindness/urls.py without a scenario, and why
+SKIPPED = {
+    "admin": "Django admin site, not part of the API.",
+    "event-stream": "Server-sent events stream that stays open; needs an ASGI server.",
+}
+NEW_PASSWORD = "Bench-new-password-1"
+
+
+def json_body(data):
+    return {"body": json.dumps(data).encode(), "content_type": "application/json"}
+
+
+def multipart_body(data):
+    return {"body": encode_multipart(BOUNDARY, data), "content_type": MULTIPART_CONTENT}
+
+
+def percentile(ordered, percent):
+    """Nearest-rank percentile of the sorted list ``ordered``."""
+    return ordered[max(ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+class Session:
+    """One concurrent client: a synthetic user with its own test client, token and random generator."""
+
+    def __init__(self, user, seed):
+        self.user = user
+        self.rng = random.Random(f"{seed}:{user.pk}")
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {issue_tokens(user)['access']}"}
+        self.own_donations = list(Donation.objects.filter(donor=user).values_list("pk", flat=True)[:100])
+        self.client = None  # Created inside the benchmark settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every route of kindness/urls.py in-process with concurrent clients against the data "
+        "of generate_data, and report latency percentiles, throughput and queries per request as JSON. "
+        "Write scenarios change the data: regenerate it, or use --read-only, before comparing branches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=8, help="Concurrent clients (threads).")
+        parser.add_argument("--requests", type=int, default=200, help="Timed requests per scenario.")
+        parser.add_argument("--warmup", type=int, default=20, help="Untimed requests per scenario first.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for the objects requested.")
+        parser.add_argument("--routes", help="Comma-separated route names to run, e.g. donation-list-create,login.")
+        parser.add_argument("--read-only", action="store_true", help="Only run GET scenarios.")
+        parser.add_argument("--output", help="Write the JSON report to this file and print a summary instead.")
+
+    # (route name, method, scenario, prepare); prepare(session) returns the request to
+    # send, after creating whatever it needs. It runs before the timed phase.
+    @property
+    def scenarios(self):
+        return [
+            ("register", "POST", "new account", self.register),
+            ("login", "POST", "password check", self.login),
+            ("logout", "POST", "blacklist refresh token", self.logout),
+            ("change-password", "POST", "rehash, reissue tokens", self.change_password),
+            ("donation-list-create", "GET", "first page", lambda s: self.authorized("/api/donations/", s)),
+            ("donation-list-create", "GET", "available in category", self.donation_list_filtered),
+            ("donation-list-create", "GET", "donor city", self.donation_list_city),
+            ("donation-list-create", "GET", "full-text search", self.donation_list_search),
+            ("donation-list-create", "GET", "second page", self.donation_list_next_page),
+            ("donation-list-create", "POST", "create with image", self.donation_create),
+            ("donation-detail", "GET", "fetch", lambda s: self.authorized(f"/api/donations/{self.pick('donations', s)}/", s)),
+            ("donation-detail", "GET", "revalidate (304)", self.donation_revalidate),
+            ("donation-detail", "PUT", "update own", self.donation_update),
+            ("donation-detail", "DELETE", "delete", self.donation_delete),
+            ("donation-bulk-create", "POST", "10 donations", self.donation_bulk_create),
+            ("upload-create", "POST", "start upload", self.upload_create),
+            ("upload-detail", "GET", "resume offset", lambda s: self.authorized(f"/api/uploads/{self.new_upload(s).pk}/", s)),
+            ("upload-detail", "PATCH", "single chunk", self.upload_chunk),
+            ("request-list-create", "GET", "first page", lambda s: self.authorized("/api/requests/", s)),
+            ("request-list-create", "POST", "admission", self.request_create),
+            ("request-detail", "GET", "fetch", lambda s: self.authorized(f"/api/requests/{self.pick('requests', s)}/", s)),
+            ("request-detail", "DELETE", "withdraw", self.request_delete),
+            ("mark-as-claimed", "PATCH", "claim approved", self.mark_as_claimed),
+            ("log", "POST", "client log line", self.log),
+            ("log-batch", "POST", "50 events", self.log_batch),
+            ("user-dashboard", "GET", "dashboard", lambda s: self.authorized("/api/user-dashboard/", s)),
+            ("user-dashboard", "POST", "approve request", self.moderate),
+            ("user-notifications", "GET", "counters", lambda s: self.authorized("/api/user-notifications/", s)),
+            ("user-profile", "GET", "own profile", lambda s: self.authorized("/api/user/profile/", s)),
+            ("user-profile", "PUT", "update bio", self.profile_update),
+            ("user-profile", "DELETE", "delete account", self.profile_delete),
+            ("token_obtain_pair", "POST", "password check", self.token_obtain),
+            ("token_refresh", "POST", "new access token", self.token_refresh),
+            ("metrics", "GET", "scrape", self.metrics),
+        ]
+
+    def handle(self, *args, **options):
+        if options["clients"] < 1 or options["requests"] < 1:
+            raise CommandError("--clients and --requests must be at least 1.")
+        users = list(
+            synthetic_users().filter(Exists(Donation.objects.filter(donor=OuterRef("pk")))).order_by("pk")
+            [:options["clients"]]
+        )
+        if len(users) < options["clients"]:
+            raise CommandError("Not enough synthetic users with donations; run generate_data first.")
+
+        scenarios, skipped = self.select(options)
+        started = timezone.now()
+        self.run_id = uuid.uuid4().hex[:8]
+        self.created = 0
+        self.password_hash = make_password(PASSWORD)
+        self.metrics_token = uuid.uuid4().hex
+        self.image = self.make_image()
+        self.rng = random.Random(options["seed"])
+        # Derivative workers writing behind the requests' backs would fail on SQLite's single writer lock
+        self.async_images = settings.IMAGE_PIPELINE["ASYNC"] and connection.vendor != "sqlite"
+        self.pools = self.load_pools()
+        self.helper = self.bench_user()  # Donor of the objects the scenarios consume
+        sessions = [Session(user, options["seed"]) for user in users]
+        report = {"meta": self.metadata(options), "routes": [], "skipped": skipped}
+
+        connection_created.connect(install_query_recorder)
+        for conn in connections.all():
+            if conn.connection is not None:
+                install_query_recorder(None, conn)
+        try:
+            with override_settings(
+                DEBUG=False,  # No query log kept in memory
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                THROTTLING={**settings.THROTTLING, "RATES": {}},
+                LOAD_SHEDDING={**settings.LOAD_SHEDDING, "MAX_IN_FLIGHT": 0, "LATENCY_THRESHOLD_MS": 0},
+                QUERY_INSPECTION={**settings.QUERY_INSPECTION, "MODE": None},
+                METRICS={**settings.METRICS, "TOKEN": self.metrics_token},
+                IMAGE_PIPELINE={**settings.IMAGE_PIPELINE, "ASYNC": self.async_images},
+            ):
+                for session in sessions:
+                    session.client = Client(raise_request_exception=False)
+                for name, method, label, prepare in scenarios:
+                    # SQLite takes one writer at a time and fails, rather than waits, when a
+                    # reading transaction needs to write, so writes get a single client there.
+                    clients = sessions[:1] if method != "GET" and connection.vendor == "sqlite" else sessions
+                    result = self.run_scenario(clients, method, prepare, options)
+                    report["routes"].append({
+                        "route": name, "method": method, "scenario": label, "clients": len(clients), **result,
+                    })
+                    if options["output"]:
+                        self.stdout.write(self.summary(report["routes"][-1]))
+        finally:
+            connection_created.disconnect(install_query_recorder)
+            for upload in Upload.objects.filter(user__in=users, created_at__gte=started):
+                discard(upload)
+            User.objects.filter(username__startswith=f"bench-{self.run_id}").delete()
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as output_file:
+                output_file.write(output + "\n")
+        else:
+            self.stdout.write(output)
+        if any(route["errors"] for route in report["routes"]):
+            raise CommandError("Some requests failed with a server error.")
+
+    def select(self, options):
+        """The scenarios to run, and the routes left out with the reason."""
+        names = self.route_names()
+        scenarios = [scenario for scenario in self.scenarios if scenario[0] in names]
+        covered = {scenario[0] for scenario in scenarios}
+        skipped = [{"route": name, "reason": SKIPPED.get(name, "No scenario.")} for name in names if name not in covered]
+        for entry in skipped:
+            if entry["route"] not in SKIPPED:
+                self.stderr.write(f"No scenario for route {entry['route']!r}.")
+        if options["routes"]:
+            wanted = set(options["routes"].split(","))
+            unknown = wanted - covered
+            if unknown:
+                raise CommandError(f"No scenario for: {', '.join(sorted(unknown))}.")
+            scenarios = [scenario for scenario in scenarios if scenario[0] in wanted]
+        if options["read_only"]:
+            scenarios = [scenario for scenario in scenarios if scenario[1] == "GET"]
+        return scenarios, skipped
+
+    def route_names(self):
+        names = []
+        for pattern in get_resolver().url_patterns:
+            if isinstance(pattern, URLResolver):
+                names.append(pattern.app_name or str(pattern.pattern))
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                names.append(pattern.name)
+        return names
+
+    def run_scenario(self, sessions, method, prepare, options):
+        """Send ``--warmup`` and then ``--requests`` requests, spread over the sessions, each in its thread."""
+        plans = {id(session): ([], []) for session in sessions}
+        for index in range(options["warmup"] + options["requests"]):
+            session = sessions[index % len(sessions)]
+            plans[id(session)][index >= options["warmup"]].append(prepare(session))
+
+        samples = []  # (seconds, status, queries)
+        lock = threading.Lock()
+        ready = threading.Barrier(len(sessions) + 1)
+
+        def client(session):
+            warmup, timed = plans[id(session)]
+            try:
+                for spec in warmup:
+                    self.send(session, method, spec)
+                ready.wait()
+                measured = []
+                for spec in timed:
+                    with recording() as log:
+                        started = time.perf_counter()
+                        status = self.send(session, method, spec)
+                        elapsed = time.perf_counter() - started
+                    measured.append((elapsed, status, len(log)))
+                with lock:
+                    samples.extend(measured)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=client, args=(session,)) for session in sessions]
+        for thread in threads:
+            thread.start()
+        ready.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(seconds * 1000 for seconds, _, _ in samples)
+        statuses = {}
+        for _, status, _ in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        queries = [count for _, _, count in samples]
+        return {
+            "requests": len(samples),
+            "errors": sum(count for status, count in statuses.items() if int(status) >= 500),
+            "statuses": statuses,
+            "throughput": round(len(samples) / elapsed, 2),
+            "latency_ms": {
+                "mean": round(sum(latencies) / len(latencies), 3),
+                "p50": round(percentile(latencies, 50), 3),
+                "p95": round(percentile(latencies, 95), 3),
+                "p99": round(percentile(latencies, 99), 3),
+                "max": round(latencies[-1], 3),
+            },
+            "queries": {"mean": round(sum(queries) / len(queries), 2), "max": max(queries)},
+        }
+
+    def send(self, session, method, spec):
+        response = session.client.generic(
+            method, spec["path"], spec.get("body", b""), spec.get("content_type", "application/octet-stream"),
+            **spec.get("headers", session.auth),
+        )
+        return response.status_code
+
+    def summary(self, route):
+        latency = route["latency_ms"]
+        line = (
+            f"{route['method']:<6} {route['route']:<22} {route['scenario']:<24} {route['throughput']:>8.1f} req/s"
+            f"  p50 {latency['p50']:>7.1f}  p95 {latency['p95']:>7.1f}  p99 {latency['p99']:>7.1f} ms"
+            f"  {route['queries']['mean']:>5.1f} queries"
+        )
+        return self.style.ERROR(line) if route["errors"] else line
+
+    def metadata(self, options):
+        def git(*args):
+            try:
+                return subprocess.run(
+                    ["git", *args], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+                ).stdout.strip()
+            except (OSError, subprocess.CalledProcessError):
+                return None
+
+        return {
+            "started_at": timezone.now().isoformat(),
+            "git_commit": git("rev-parse", "HEAD"),
+            "git_dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+            "database": {
+                "vendor": connection.vendor,
+                "version": ".".join(map(str, connection.get_database_version())),
+            },
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "data": {
+                "users": User.objects.count(),
+                "donations": Donation.objects.count(),
+                "requests": Request.objects.count(),
+            },
+            "async_image_pipeline": self.async_images,
+            "options": {key: options[key] for key in ("clients", "requests", "warmup", "seed", "read_only")},
+        }
+
+    # --- Data the scenarios draw from ---
+
+    def load_pools(self):
+        """Deterministic samples of existing ids, drawn from the primary key range."""
+        def sample(queryset, size=2000):
+            bounds = queryset.model.objects.order_by("pk").values_list("pk", flat=True)
+            low, high = bounds.first(), bounds.last()
+            if low is None:
+                return []
+            candidates = {self.rng.randint(low, high) for _ in range(size * 2)}
+            return sorted(queryset.filter(pk__in=candidates).values_list("pk", flat=True)[:size])
+
+        pools = {
+            "donations": sample(Donation.objects.all()),
+            "requests": sample(Request.objects.all()),
+            "available": sample(
+                Donation.objects.filter(status="AVAILABLE", admitted_requests__lt=Donation.MAX_REQUESTS)
+            ),
+            "categories": [key for key, _ in Donation.CATEGORY_CHOICES],
+            "cities": list(synthetic_users().values_list("city", flat=True).distinct().order_by("city")),
+        }
+        if not pools["donations"] or not pools["requests"]:
+            raise CommandError("No donations or requests to benchmark; run generate_data first.")
+        return pools
+
+    def pick(self, pool, session):
+        return session.rng.choice(self.pools[pool])
+
+    def make_image(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (320, 240), (200, 120, 40)).save(buffer, "JPEG", quality=85)
+        return buffer.getvalue()
+
+    def bench_user(self):
+        """A throwaway user, deleted after the run with everything it owns."""
+        self.created += 1
+        name = f"bench-{self.run_id}-{self.created}"
+        return User.objects.create(username=name, email=f"{name}@example.com", password=self.password_hash)
+
+    def bench_donation(self, donor, **fields):
+        self.created += 1
+        return Donation.objects.create(
+            donor=donor, item_name=f"Bench item {self.created}", description="Benchmark fixture.",
+            category="OTHER", quantity=5, **fields,
+        )
+
+    def new_upload(self, session, **fields):
+        upload = Upload.objects.create(
+            user=session.user, filename="bench.jpg", size=len(self.image),
+            sha256=hashlib.sha256(self.image).hexdigest(), **fields,
+        )
+        create_part_file(upload)
+        return upload
+
+    # --- Requests ---
+
+    def authorized(self, path, session):
+        return {"path": path, "headers": session.auth}
+
+    def register(self, session):
+        self.created += 1
+        name = f"bench-{self.run_id}-{self.created}"
+        body = json_body({"username": name, "email": f"{name}@example.com", "password": PASSWORD, "city": "Austin"})
+        return {"path": "/api/register/", "headers": {}, **body}
+
+    def login(self, session):
+        return {"path": "/api/login/", "headers": {}, **json_body({"email": session.user.email, "password": PASSWORD})}
+
+    def token_obtain(self, session):
+        return {"path": "/api/token/", "headers": {}, **json_body({"email": session.user.email, "password": PASSWORD})}
+
+    def logout(self, session):
+        return {"path": "/api/logout/", **json_body({"refresh": issue_tokens(session.user)["refresh"]})}
+
+    def change_password(self, session):
+        user = self.bench_user()
+        body = json_body({"old_password": PASSWORD, "new_password": NEW_PASSWORD, "confirm_password": NEW_PASSWORD})
+        return {
+            "path": "/api/user/change-password/",
+            "headers": {"HTTP_AUTHORIZATION": f"Bearer {issue_tokens(user)['access']}"},
+            **body,
+        }
+
+    def donation_list_filtered(self, session):
+        category = session.rng.choice(self.pools["categories"])
+        return self.authorized(f"/api/donations/?status=AVAILABLE&category={category}", session)
+
+    def donation_list_city(self, session):
+        return self.authorized(f"/api/donations/?city={session.rng.choice(self.pools['cities'])}", session)
+
+    def donation_list_search(self, session):
+        term = session.rng.choice(["coat", "books", "rice", "laptop", "shoes", "blankets"])
+        return self.authorized(f"/api/donations/?q={term}", session)
+
+    def donation_list_next_page(self, session):
+        response = session.client.get("/api/donations/", **session.auth)
+        return {"path": response.json()["next"], "headers": session.auth}
+
+    def donation_create(self, session):
+        self.created += 1
+        body = multipart_body({
+            "item_name": f"Bench item {self.created}", "description": "Benchmark donation.",
+            "category": "BOOKS", "quantity": 1, "image": SimpleUploadedFile("bench.jpg", self.image, "image/jpeg"),
+        })
+        return {"path": "/api/donations/", "headers": session.auth, **body}
+
+    def donation_revalidate(self, session):
+        path = f"/api/donations/{self.pick('donations', session)}/"
+        etag = session.client.get(path, **session.auth)["ETag"]
+        return {"path": path, "headers": {**session.auth, "HTTP_IF_NONE_MATCH": etag}}
+
+    def donation_update(self, session):
+        donation_id = session.rng.choice(session.own_donations)
+        body = json_body({"description": f"Updated {session.rng.randrange(10 ** 6)}."})
+        return {"path": f"/api/donations/{donation_id}/", "headers": session.auth, **body}
+
+    def donation_delete(self, session):
+        return self.authorized(f"/api/donations/{self.bench_donation(self.helper).pk}/", session)
+
+    def donation_bulk_create(self, session):
+        items = [
+            {"item_name": f"Bulk item {index}", "description": "Benchmark donation.", "category": "CLOTHES"}
+            for index in range(10)
+        ]
+        files = {f"image_{index}": SimpleUploadedFile("bench.jpg", self.image, "image/jpeg") for index in range(10)}
+        body = multipart_body({"donations": json.dumps(items), **files})
+        return {"path": "/api/donations/bulk/", "headers": session.auth, **body}
+
+    def upload_create(self, session):
+        body = json_body({"filename": "bench.jpg", "size": len(self.image), "sha256": hashlib.sha256(self.image).hexdigest()})
+        return {"path": "/api/uploads/", "headers": session.auth, **body}
+
+    def upload_chunk(self, session):
+        return {
+            "path": f"/api/uploads/{self.new_upload(session).pk}/",
+            "headers": {**session.auth, "HTTP_UPLOAD_OFFSET": "0"},
+            "body": self.image,
+            "content_type": "application/offset+octet-stream",
+        }
+
+    def request_create(self, session):
+        body = json_body({"donation": self.pick("available", session), "requested_quantity": 1})
+        return {"path": "/api/requests/", "headers": session.auth, **body}
+
+    def request_delete(self, session):
+        request_obj = Request.objects.create(user=session.user, donation=self.bench_donation(self.helper))
+        return self.authorized(f"/api/requests/{request_obj.pk}/", session)
+
+    def mark_as_claimed(self, session):
+        donation = self.bench_donation(self.helper, status="RESERVED")
+        request_obj = Request.objects.create(user=session.user, donation=donation, status="APPROVED")
+        return self.authorized(f"/api/requests/{request_obj.pk}/mark-as-claimed/", session)
+
+    def log(self, session):
+        return {"path": "/api/log/", "headers": session.auth, **json_body({"message": "Benchmark.", "level": "info"})}
+
+    def log_batch(self, session):
+        events = [
+            {"level": ("debug", "info", "warning", "error")[index % 4], "message": f"Benchmark event {index}.",
+             "source": "run_benchmark", "context": {"index": index}}
+            for index in range(50)
+        ]
+        return {"path": "/api/log/batch/", "headers": session.auth, **json_body({"events": events})}
+
+    def moderate(self, session):
+        donor = self.bench_user()
+        request_obj = Request.objects.create(user=session.user, donation=self.bench_donation(donor))
+        return {
+            "path": "/api/user-dashboard/",
+            "headers": {"HTTP_AUTHORIZATION": f"Bearer {issue_tokens(donor)['access']}"},
+            **json_body({"action": "approve", "request_id": request_obj.pk}),
+        }
+
+    def profile_update(self, session):
+        body = json_body({"bio": f"Benchmark bio {session.rng.randrange(10 ** 6)}."})
+        return {"path": "/api/user/profile/", "headers": session.auth, **body}
+
+    def profile_delete(self, session):
+        user = self.bench_user()
+        return {"path": "/api/user/profile/", "headers": {"HTTP_AUTHORIZATION": f"Bearer {issue_tokens(user)['access']}"}}
+
+    def token_refresh(self, session):
+        return {"path": "/api/token/refresh/", "headers": {}, **json_body({"refresh": issue_tokens(session.user)["refresh"]})}
+
+    def metrics(self, session):
+        return {"path": "/metrics/", "headers": {"HTTP_AUTHORIZATION": f"Bearer {self.metrics_token}"}}
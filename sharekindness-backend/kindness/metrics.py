@@ -0,0 +1,219 @@
+"""
+Per-route request metrics in the Prometheus text exposition format.
+
+MetricsMiddleware records, for each resolved URL route and method: latency,
+response size and database queries (count and time, through an execute wrapper
+on every connection) as histograms, and requests by status code.
+``MetricsView`` serves them with the dashboard cache statistics on
+``/metrics/``.
+
+Metrics are kept per process. Under a multi-process server, scrape each
+worker, or aggregate in Prometheus with ``sum without (instance)``.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}  # label values -> count
+
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def lines(self):
+        for labels, value in sorted(self.values.items()):
+            yield f'{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.values = {}  # label values -> [count per bucket and +Inf, sum]
+
+    def observe(self, labels, value):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def lines(self):
+        names = (*self.labelnames, 'le')
+        for labels, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{format_labels(names, (*labels, bound))} {cumulative}'
+            yield f'{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(total)}'
+            yield f'{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}'
+
+
+class RequestMetrics:
+    """The request metrics of this process, updated under one lock per request."""
+
+    def __init__(self):
+        options = settings.METRICS
+        labels = ('method', 'route')
+        self.lock = threading.Lock()
+        self.requests = Counter('http_requests_total', 'Requests by route, method and status.', (*labels, 'status'))
+        self.latency = Histogram(
+            'http_request_duration_seconds', 'Time to produce the response.', labels, options['LATENCY_BUCKETS']
+        )
+        self.size = Histogram(
+            'http_response_size_bytes', 'Response body size, after compression.', labels, options['SIZE_BUCKETS']
+        )
+        self.queries = Histogram(
+            'http_request_db_queries', 'Database queries per request.', labels, options['QUERY_BUCKETS']
+        )
+        self.query_time = Histogram(
+            'http_request_db_duration_seconds', 'Database time per request.', labels, options['LATENCY_BUCKETS']
+        )
+
+    def record(self, method, route, status, seconds, size, timer):
+        labels = (method, route)
+        with self.lock:
+            self.requests.inc((method, route, str(status)))
+            self.latency.observe(labels, seconds)
+            if size is not None:
+                self.size.observe(labels, size)
+            self.queries.observe(labels, timer.count)
+            self.query_time.observe(labels, timer.seconds)
+
+    def render(self):
+        with self.lock:
+            return render([self.requests, self.latency, self.size, self.queries, self.query_time])
+
+
+def render(metrics):
+    lines = []
+    for metric in metrics:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.lines())
+    return '\n'.join(lines) + '\n'
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = RequestMetrics()
+        return _metrics
+
+
+class QueryTimer:
+    """Count and time of the queries of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# The timer of the request being handled. A context variable rather than a
+# per-request connection.execute_wrapper: connections are per thread, and under
+# ASGI the queries run in sync_to_async threads, which copy the context.
+current_timer = ContextVar('current_timer', default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.count += 1
+        timer.seconds += time.perf_counter() - started
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver adding ``time_query`` to each new connection once."""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+# Other methods are reported as "other", so clients cannot add label values
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+def route_of(request):
+    """The matched URL pattern, e.g. ``api/donations/<int:pk>/``, rather than the path."""
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'unmatched'
+
+
+class MetricsMiddleware:
+    """Records RequestMetrics for every request; first in MIDDLEWARE so it sees the whole stack."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.metrics = get_metrics()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timer = QueryTimer()
+        token = current_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        self.record(request, response, time.perf_counter() - started, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        token = current_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        self.record(request, response, time.perf_counter() - started, timer)
+        return response
+
+    def record(self, request, response, seconds, timer):
+        size = None if response.streaming else len(response.content)
+        method = request.method if request.method in METHODS else 'other'
+        self.metrics.record(method, route_of(request), response.status_code, seconds, size, timer)
@@ -0,0 +1,119 @@
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip is offered
+    brotli = None
+
+# Content types worth compressing; media is already compressed and event streams must not be buffered.
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript')
+
+# An ETag we suffixed with the content coding, e.g. "abc-gzip"
+re_coded_etag = re.compile(r'-(?:br|gzip)"')
+
+
+def accepted_codings(header):
+    """Codings the client accepts, i.e. those listed in Accept-Encoding without q=0."""
+    codings = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        codings.add(coding.strip().lower())
+    return codings
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Brotli (when the ``brotli`` package is installed) or gzip compression of
+    responses of at least ``COMPRESSION['MIN_SIZE']`` bytes, chosen from the
+    client's Accept-Encoding.
+
+    Rather than weakening the ETag of a compressed response, as GZipMiddleware
+    does, the coding is appended to it ("abc-gzip"), and stripped again from
+    If-Match/If-None-Match. ETags therefore stay strong and If-Match keeps working
+    whichever coding the client received.
+    """
+    max_random_bytes = 100  # Randomised gzip header length, as GZipMiddleware (BREACH mitigation)
+
+    def process_request(self, request):
+        request._if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        for header in ('HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH'):
+            if header in request.META:
+                request.META[header] = re_coded_etag.sub('"', request.META[header])
+
+    def process_response(self, request, response):
+        options = settings.COMPRESSION
+        etag = response.get('ETag')
+
+        if response.status_code == 304:
+            # Answer with the ETag in the form the client validated.
+            if etag and etag.startswith('"'):
+                for coded in (f'{etag[:-1]}-br"', f'{etag[:-1]}-gzip"'):
+                    if coded in getattr(request, '_if_none_match', ''):
+                        response.headers['ETag'] = coded
+            return response
+
+        if (
+            response.streaming
+            or len(response.content) < options['MIN_SIZE']
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = self.negotiate(request)
+        if coding is None:
+            return response
+
+        if coding == 'br':
+            compressed = brotli.compress(response.content, quality=options['BROTLI_QUALITY'])
+        else:
+            compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = coding
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = f'{etag[:-1]}-{coding}"'
+        return response
+
+    def negotiate(self, request):
+        codings = accepted_codings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in codings:
+            return 'br'
+        if 'gzip' in codings:
+            return 'gzip'
+        return None
+
+
+class ImmutableMediaMiddleware(MiddlewareMixin):
+    """
+    ``Cache-Control: public, max-age=31536000, immutable`` on media served from
+    ``MEDIA_URL`` + ``blobs/``, whose names are content hashes and so never change
+    meaning (see kindness.storage). This covers media served by Django; a web
+    server serving MEDIA_ROOT itself needs the same header on that path, e.g. for
+    nginx ``location /media/blobs/ { add_header Cache-Control "public, max-age=31536000, immutable"; }``.
+    """
+    cache_control = 'public, max-age=31536000, immutable'
+
+    def process_response(self, request, response):
+        from .storage import ContentAddressedStorage
+
+        prefix = f'{settings.MEDIA_URL}{ContentAddressedStorage.blob_directory}/'
+        if response.status_code == 200 and request.path.startswith(prefix):
+            response['Cache-Control'] = self.cache_control
+        return response
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.17 on 2026-10-18 15:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kindness', '0013_donation_request_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['status', 'category', 'created_at', 'id'], name='donation_status_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='donation_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['state', 'city'], name='user_state_city_idx'),
+        ),
+    ]
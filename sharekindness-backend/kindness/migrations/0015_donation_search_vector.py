@@ -0,0 +1,108 @@
+# Generated by Django 4.2.17 on 2026-10-18 15:31
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Frozen copies of kindness.search as of this migration; kindness.search may change.
+SEARCH_CONFIG = 'english'
+
+FTS_TABLE = 'kindness_donation_fts'
+
+POSTGRESQL_INSTALL = [
+    f"""
+    CREATE OR REPLACE FUNCTION kindness_donation_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.item_name, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS kindness_donation_search_vector_trigger ON kindness_donation",
+    """
+    CREATE TRIGGER kindness_donation_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF item_name, description, search_vector ON kindness_donation
+    FOR EACH ROW EXECUTE FUNCTION kindness_donation_search_vector_update()
+    """,
+    "CREATE INDEX IF NOT EXISTS donation_search_vector_idx ON kindness_donation USING gin (search_vector)",
+]
+
+POSTGRESQL_BACKFILL = "UPDATE kindness_donation SET search_vector = NULL WHERE search_vector IS NULL"
+
+POSTGRESQL_UNINSTALL = [
+    "DROP INDEX IF EXISTS donation_search_vector_idx",
+    "DROP TRIGGER IF EXISTS kindness_donation_search_vector_trigger ON kindness_donation",
+    "DROP FUNCTION IF EXISTS kindness_donation_search_vector_update()",
+]
+
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON kindness_donation BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, item_name, description)
+            VALUES (new.id, new.item_name, new.description);
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON kindness_donation BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, item_name, description)
+            VALUES ('delete', old.id, old.item_name, old.description);
+        END
+    """,
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF item_name, description
+        ON kindness_donation BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, item_name, description)
+            VALUES ('delete', old.id, old.item_name, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, item_name, description)
+            VALUES (new.id, new.item_name, new.description);
+        END
+    """,
+}
+
+
+def install(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in POSTGRESQL_INSTALL:
+                cursor.execute(sql)
+            # Firing the trigger fills in rows that predate it.
+            cursor.execute(POSTGRESQL_BACKFILL)
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"item_name, description, content='kindness_donation', content_rowid='id', "
+                f"tokenize='porter unicode61')"
+            )
+            for sql in SQLITE_TRIGGERS.values():
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in POSTGRESQL_UNINSTALL:
+                cursor.execute(sql)
+        elif connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kindness', '0014_donation_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donation',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(install, uninstall),
+    ]
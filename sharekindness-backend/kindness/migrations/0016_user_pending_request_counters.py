@@ -0,0 +1,47 @@
+# Generated by Django 4.2.17 on 2026-10-18 15:33
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    # A frozen copy of kindness.counters.rebuild_pending_counters, on the historical models.
+    User = apps.get_model('kindness', 'User')
+    Request = apps.get_model('kindness', 'Request')
+
+    def pending_count(**lookup):
+        counts = (
+            Request.objects.filter(status='PENDING', **lookup)
+            .order_by()
+            .values(*lookup)
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    User.objects.update(
+        pending_incoming_requests=pending_count(donation__donor=OuterRef('pk')),
+        pending_outgoing_requests=pending_count(user=OuterRef('pk')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kindness', '0015_donation_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='pending_incoming_requests',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='pending_outgoing_requests',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
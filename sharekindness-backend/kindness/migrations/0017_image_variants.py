@@ -0,0 +1,23 @@
+# Generated by Django 4.2.17 on 2026-10-18 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kindness', '0016_user_pending_request_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donation',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='profile_picture_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.17 on 2026-10-18 15:41
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_admitted_requests(apps, schema_editor):
+    # A frozen copy of kindness.counters.rebuild_admitted_requests, on the historical models.
+    Donation = apps.get_model('kindness', 'Donation')
+    Request = apps.get_model('kindness', 'Request')
+    counts = (
+        Request.objects.filter(donation=OuterRef('pk'))
+        .order_by()
+        .values('donation')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Donation.objects.update(
+        admitted_requests=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kindness', '0019_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donation',
+            name='admitted_requests',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_admitted_requests, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,62 @@
+import os
+import uuid
+
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
+
+
+class TracksLoadedFiles:
+    """Remembers file names as loaded, so a replaced file can be released after save."""
+    tracked_file_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_files = {
+            field: getattr(instance.__dict__.get(field), 'name', instance.__dict__.get(field))
+            for field in cls.tracked_file_fields
+        }
+        return instance
+
+
+class TrackedImageFieldFile(models.fields.files.ImageFieldFile):
+    def save(self, name, content, save=True):
+        # Every stored file takes a storage reference, even when its bytes, and so its name, are unchanged
+        self.instance.__dict__.setdefault('_stored_files', set()).add(self.field.name)
+        super().save(name, content, save)
+
+
+class TrackedImageField(models.ImageField):
+    """An ImageField that tells TracksLoadedFiles models which files a save stored anew."""
+    attr_class = TrackedImageFieldFile
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        return name, 'django.db.models.ImageField', args, kwargs  # Same column; no migration
+
+
+class ProtectsCounterFields:
+    """
+    Full saves skip ``COUNTER_FIELDS``: counters are only changed through F()
+    updates, and writing back a value loaded earlier would lose concurrent updates.
+    """
+    COUNTER_FIELDS = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            skipped = set(self.COUNTER_FIELDS) | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped and field.name not in skipped
+            ]
+        super().save(*args, **kwargs)
 
 
 # 1⃣ Custom User model
-class User(AbstractUser):
+class User(ProtectsCounterFields, TracksLoadedFiles, AbstractUser):
     ROLE_CHOICES = [
         ('DONOR', 'Donor'),
         ('RECIPIENT', 'Recipient'),
@@ -11,19 +64,52 @@ class User(AbstractUser):
 
     email = models.EmailField(unique=True)
     roles = models.ManyToManyField('Role', related_name='users')  # Many-to-Many relationship
-    profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    profile_picture = TrackedImageField(upload_to='profile_pics/', blank=True, null=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)  # See kindness.images
     phone_number = models.CharField(max_length=15, blank=True, null=True)  # Optional phone number
     city = models.CharField(max_length=50, blank=True, null=True)  # City of residence
     state = models.CharField(max_length=50, blank=True, null=True)  # State of residence
     bio = models.TextField(blank=True, null=True)  # Optional bio or description
     is_verified = models.BooleanField(default=False)  # Indicates if the user is verified
+    # Denormalized notification counters, maintained by kindness.counters
+    pending_incoming_requests = models.PositiveIntegerField(default=0, editable=False)
+    pending_outgoing_requests = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)  # Validator for conditional requests on the profile
+    # Claimed by every issued JWT; bumping it revokes them (see kindness.authentication)
+    token_version = models.PositiveIntegerField(default=0, editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']  # Keep 'username' for compatibility
+    tracked_file_fields = ('profile_picture',)
+    COUNTER_FIELDS = ('pending_incoming_requests', 'pending_outgoing_requests')
+    # Rendered by UserSerializer inside other users' dashboards and donations
+    DASHBOARD_FIELDS = (
+        'username', 'email', 'profile_picture', 'profile_picture_variants', 'phone_number', 'city', 'state', 'bio',
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the rendered fields so post_save can tell whether a save changed them.
+        instance._loaded_profile = instance.profile_snapshot()
+        return instance
+
+    def profile_snapshot(self):
+        """The loaded or assigned values of ``DASHBOARD_FIELDS``, files by name."""
+        return {
+            field: getattr(self.__dict__[field], 'name', self.__dict__[field])
+            for field in self.DASHBOARD_FIELDS if field in self.__dict__
+        }
 
     def __str__(self):
         return f"{self.email} (Roles: {', '.join(role.name for role in self.roles.all())})"
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Backs the donor location filters on the donation list
+            models.Index(fields=['state', 'city'], name='user_state_city_idx'),
+        ]
+
 
 class Role(models.Model):
     name = models.CharField(max_length=20, choices=User.ROLE_CHOICES, unique=True)
@@ -32,8 +118,30 @@ class Role(models.Model):
         return self.name
 
 
+class DonationQuerySet(models.QuerySet):
+    def touch(self):
+        """Mark the donations as changed because something they render, e.g. a claim, changed."""
+        return self.update(updated_at=timezone.now())
+
+    def with_related(self):
+        """Load everything DonationSerializer reads in a fixed number of queries."""
+        return self.select_related('donor').prefetch_related(
+            models.Prefetch(
+                'requests',
+                queryset=Request.objects.filter(status='CLAIMED').select_related('user'),
+                to_attr='claimed_requests',
+            )
+        )
+
+
+class DonationManager(models.Manager.from_queryset(DonationQuerySet)):
+    def get_queryset(self):
+        # search_vector is only ever read by the database (see kindness.search); never load it.
+        return super().get_queryset().defer('search_vector')
+
+
 # 2⃣ Donation model
-class Donation(models.Model):
+class Donation(ProtectsCounterFields, TracksLoadedFiles, models.Model):
     CATEGORY_CHOICES = [
         ('FOOD', 'Food'),
         ('CLOTHES', 'Clothes'),
@@ -55,13 +163,46 @@ class Donation(models.Model):
     description = models.TextField()
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='OTHER')
     quantity = models.PositiveIntegerField(default=1)  # Field to track quantity
-    image = models.ImageField(upload_to='donation_images/', blank=True, null=True)
+    image = TrackedImageField(upload_to='donation_images/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # See kindness.images
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='AVAILABLE')
+    # Requests admitted so far, taken and released atomically (see RequestListCreateView.post)
+    admitted_requests = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Last change to anything DonationSerializer renders, including the donor and claims (see kindness.signals)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by a database trigger on PostgreSQL (see kindness.search); unused on SQLite
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = DonationManager()
+    tracked_file_fields = ('image',)
+    COUNTER_FIELDS = ('admitted_requests',)
+    MAX_REQUESTS = 5  # Requests a donation accepts before it is closed
 
     def __str__(self):
         return f"{self.item_name} ({self.get_status_display()})"
 
+    class Meta:
+        indexes = [
+            # Backs keyset pagination of the donation list
+            models.Index(fields=['created_at', 'id'], name='donation_created_id_idx'),
+            # Backs the filtered feed: AVAILABLE items of one category, newest first
+            models.Index(fields=['status', 'category', 'created_at', 'id'], name='donation_status_cat_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='donation_status_created_idx'),
+        ]
+
+
+class RequestQuerySet(models.QuerySet):
+    def with_related(self):
+        """Load everything RequestSerializer reads in a fixed number of queries."""
+        return self.select_related('user', 'donation__donor').defer('donation__search_vector').prefetch_related(
+            models.Prefetch(
+                'donation__requests',
+                queryset=Request.objects.filter(status='CLAIMED').select_related('user'),
+                to_attr='claimed_requests',
+            )
+        )
+
 
 # 3⃣ Request model
 class Request(models.Model):
@@ -77,9 +218,57 @@ class Request(models.Model):
     requested_quantity = models.PositiveIntegerField(default=1)
     comments = models.CharField(max_length=255, blank=True, null=True)  # Optional comment field (50-word limit)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RequestQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so post_save can tell which transition happened.
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
 
     def __str__(self):
         return f"Request by {self.user.email} for {self.donation.item_name} ({self.get_status_display()})"
 
     class Meta:
         unique_together = ('user', 'donation')
+        indexes = [
+            # Backs keyset pagination of the request list
+            models.Index(fields=['created_at', 'id'], name='request_created_id_idx'),
+        ]
+
+
+# 4⃣ Reference counts for kindness.storage.ContentAddressedStorage
+class MediaBlob(models.Model):
+    name = models.CharField(max_length=255, unique=True)  # Storage name, derived from the SHA-256 digest
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)  # Saves minus deletes; the file goes at zero
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
+
+# 5⃣ Resumable upload (see kindness.uploads)
+class Upload(models.Model):
+    STATUS_CHOICES = [
+        ('IN_PROGRESS', 'In progress'),  # Chunks are still being received.
+        ('COMPLETE', 'Complete'),  # All bytes received and the checksum matched.
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()  # Declared total size in bytes
+    sha256 = models.CharField(max_length=64)  # Expected hex digest of the whole file
+    received = models.PositiveBigIntegerField(default=0)  # Bytes stored so far; the next chunk's offset
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='IN_PROGRESS')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def path(self):
+        return os.path.join(settings.UPLOADS['TEMP_DIR'], f'{self.pk}.part')
+
+    def __str__(self):
+        return f"Upload {self.pk} of {self.filename} ({self.received}/{self.size} bytes)"
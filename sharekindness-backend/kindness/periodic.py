@@ -0,0 +1,49 @@
+"""
+Daemon threads that run maintenance jobs, such as donation expiry and token
+pruning, periodically inside the server process.
+"""
+import logging
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class Sweeper(threading.Thread):
+    """Daemon thread that calls ``sweep`` every ``interval`` seconds."""
+
+    def __init__(self, name, sweep, interval):
+        super().__init__(name=name, daemon=True)
+        self.sweep = sweep
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        # Wait before the first sweep, so short-lived processes such as
+        # management commands exit before touching the database.
+        while not self.stopped.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Sweep %s failed", self.name)
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self.stopped.set()
+
+
+_sweepers = {}
+_sweepers_lock = threading.Lock()
+
+
+def start_sweeper(name, sweep, interval):
+    """Start the ``name`` sweeper once per process, unless ``interval`` is 0."""
+    if not interval:
+        return None
+    with _sweepers_lock:
+        if name not in _sweepers:
+            _sweepers[name] = Sweeper(name, sweep, interval)
+            _sweepers[name].start()
+    return _sweepers[name]
@@ -0,0 +1,141 @@
+"""
+N+1 query detection and per-view query budgets, for development, tests and
+staging.
+
+With ``QUERY_INSPECTION['MODE']`` set, QueryInspectionMiddleware records the
+SQL of every request and reports:
+
+- query shapes (the SQL with literals and IN lists collapsed) run at least
+  ``REPEAT_THRESHOLD`` times, the signature of a lazy load per row, and
+- requests running more queries than the view's ``query_budget``, a dict of
+  method to the queries a request may run, authentication included.
+
+``'raise'`` raises QueryInspectionError, failing the test or showing the
+debug page; ``'log'`` logs a warning and serves the response. The
+``check_query_counts`` command applies the same checks to the read endpoints.
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+re_literal = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+re_in_list = re.compile(r'IN \((?:%s|\?)(?:, (?:%s|\?))*\)')
+re_columns = re.compile(r'^SELECT .*? FROM ')
+# Transaction bookkeeping repeats legitimately
+IGNORED_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class QueryInspectionError(Exception):
+    pass
+
+
+def query_shape(sql):
+    """``sql`` with literals replaced by ``?`` and IN lists by ``IN (...)``."""
+    return re_in_list.sub('IN (...)', re_literal.sub('?', sql))
+
+
+class QueryLog:
+    """The statements run while it is the current log."""
+
+    def __init__(self, statements=()):
+        self.statements = list(statements)
+
+    def __len__(self):
+        return len(self.statements)
+
+    def repeated(self, threshold):
+        """``[(shape, times)]`` of the shapes run at least ``threshold`` times, most frequent first."""
+        shapes = Counter(
+            query_shape(sql) for sql in self.statements if not sql.startswith(IGNORED_PREFIXES)
+        )
+        return [(shape, times) for shape, times in shapes.most_common() if times >= threshold]
+
+
+current_log = ContextVar('current_log', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    log = current_log.get()
+    if log is not None:
+        log.statements.append(sql)
+    return execute(sql, params, many, context)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver adding ``record_query`` to each new connection once."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def recording():
+    """Record the queries run in this context, including sync_to_async threads, into a QueryLog."""
+    log = QueryLog()
+    token = current_log.set(log)
+    try:
+        yield log
+    finally:
+        current_log.reset(token)
+
+
+def query_problems(log, view_class, method):
+    """Descriptions of the N+1 patterns in ``log`` and of a breach of the view's budget."""
+    problems = [
+        f"{times} queries of the same shape (N+1?): {re_columns.sub('SELECT ... FROM ', shape)}"
+        for shape, times in log.repeated(settings.QUERY_INSPECTION['REPEAT_THRESHOLD'])
+    ]
+    budget = (getattr(view_class, 'query_budget', None) or {}).get(method)
+    if budget is not None and len(log) > budget:
+        problems.append(f"{len(log)} queries, over the budget of {budget} for {method}")
+    return problems
+
+
+def report(label, problems, mode):
+    if not problems:
+        return
+    message = f"{label}: " + "; ".join(problems)
+    if mode == 'raise':
+        raise QueryInspectionError(message)
+    logger.warning(message)
+
+
+class QueryInspectionMiddleware:
+    """Checks every request with ``query_problems`` and reports them per QUERY_INSPECTION['MODE']."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.mode = settings.QUERY_INSPECTION['MODE']
+        if not self.mode:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with recording() as log:
+            response = self.get_response(request)
+        self.check(request, log)
+        return response
+
+    async def __acall__(self, request):
+        with recording() as log:
+            response = await self.get_response(request)
+        self.check(request, log)
+        return response
+
+    def check(self, request, log):
+        match = getattr(request, 'resolver_match', None)
+        view_class = getattr(match.func, 'view_class', None) if match is not None else None
+        report(f"{request.method} {request.path}", query_problems(log, view_class, request.method), self.mode)
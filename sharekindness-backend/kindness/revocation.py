@@ -0,0 +1,207 @@
+"""
+Refresh token revocation: pruning of the blacklist tables, and an in-memory
+Bloom filter in front of the blacklist lookup.
+
+Every refresh (ROTATE_REFRESH_TOKENS with BLACKLIST_AFTER_ROTATION) and every
+logout blacklists a refresh token, adding OutstandingToken and BlacklistedToken
+rows, and every refresh first looks its token up in the blacklist. Rows of
+expired tokens serve no purpose, since an expired token is refused before the
+blacklist is consulted. ``prune_expired_tokens`` deletes them in batches, from
+the ``prune_tokens`` command or from an in-process sweeper when
+``TOKEN_BLACKLIST['PRUNE_INTERVAL']`` is set.
+
+``revocation_filter`` holds the jtis of blacklisted tokens. A token it does not
+contain skips the blacklist query; possible members are looked up as before.
+Tokens blacklisted by this process are added at once. Those blacklisted by
+other processes are read every ``FILTER_SYNC_INTERVAL`` seconds, which bounds
+how long another process can still accept them; each sync reads only the rows
+blacklisted since the previous one, less ``FILTER_SYNC_SKEW``.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from . import periodic
+
+logger = logging.getLogger(__name__)
+
+
+def prune_expired_tokens(now=None, batch_size=None):
+    """
+    Delete the outstanding tokens that have expired, with their blacklist
+    entries, ``batch_size`` per transaction. Returns the number deleted.
+    """
+    batch_size = batch_size or settings.TOKEN_BLACKLIST['PRUNE_BATCH_SIZE']
+    now = now or timezone.now()
+    pruned = last_id = 0
+    while True:
+        with transaction.atomic():
+            # Walk the primary key rather than expires_at, which simplejwt does not
+            # index; tokens expire roughly in the order they were issued.
+            token_ids = list(
+                OutstandingToken.objects.filter(pk__gt=last_id, expires_at__lte=now)
+                .order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not token_ids:
+                break
+            BlacklistedToken.objects.filter(token_id__in=token_ids).delete()
+            OutstandingToken.objects.filter(pk__in=token_ids).delete()
+        pruned += len(token_ids)
+        last_id = token_ids[-1]
+        if len(token_ids) < batch_size:
+            break
+    if pruned:
+        logger.info("Pruned %s expired outstanding tokens", pruned)
+    return pruned
+
+
+def start_pruner():
+    """Start the in-process pruner once per process if ``TOKEN_BLACKLIST['PRUNE_INTERVAL']`` is set."""
+    return periodic.start_sweeper('token-pruning', prune_expired_tokens, settings.TOKEN_BLACKLIST['PRUNE_INTERVAL'])
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings sized for ``capacity`` members at ``error_rate``."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0  # Approximate: members whose add set at least one bit
+
+    def positions(self, key):
+        # Double hashing over one 128-bit digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        added = False
+        for position in self.positions(key):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        self.count += added
+
+    def __contains__(self, key):
+        return all(self.bits[position // 8] & (1 << (position % 8)) for position in self.positions(key))
+
+
+class RevocationFilter:
+    """
+    Per-process Bloom filter of blacklisted jtis. It is rebuilt from the unexpired
+    blacklist every ``FILTER_REBUILD_INTERVAL`` seconds, dropping expired tokens,
+    or sooner once it outgrows its capacity.
+
+    One thread at a time queries the database, outside the lock: the others keep
+    answering from the current filter (or, before the first build, fall back to
+    the blacklist lookup) instead of waiting for it.
+    """
+    min_capacity = 1024
+    # Ids below the highest one seen that a sync may read again, since concurrent
+    # transactions can commit their rows out of id order. It only bounds the index
+    # range; the blacklisted_at watermark decides which rows are read.
+    sync_overlap = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._last_id = 0  # Highest BlacklistedToken id read
+        self._watermark = None  # Rows blacklisted before this were read by an earlier sync
+        self._built_at = self._synced_at = 0.0
+        self._refreshing = False
+        self._added = []  # jtis added by this process while a rebuild queries
+
+    @property
+    def enabled(self):
+        return bool(settings.TOKEN_BLACKLIST['FILTER_SYNC_INTERVAL'])
+
+    def might_contain(self, jti):
+        """False if ``jti`` is certainly not blacklisted; True if it may be (or the filter is off)."""
+        if not self.enabled:
+            return True
+        options = settings.TOKEN_BLACKLIST
+        refresh = None
+        with self._lock:
+            bloom = self._bloom
+            now = time.monotonic()
+            if not self._refreshing:
+                if (
+                    bloom is None
+                    or now - self._built_at >= options['FILTER_REBUILD_INTERVAL']
+                    or bloom.count > bloom.capacity
+                ):
+                    refresh = self._rebuild
+                elif now - self._synced_at >= options['FILTER_SYNC_INTERVAL']:
+                    refresh = self._sync
+                self._refreshing = refresh is not None
+        if refresh is not None:
+            try:
+                bloom = refresh(now)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+                    self._added = []
+        return bloom is None or jti in bloom
+
+    def add(self, jti):
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+            if self._refreshing:
+                self._added.append(jti)
+
+    def clear(self):
+        with self._lock:
+            self._bloom = None
+
+    def _rebuild(self, now):
+        started = timezone.now()
+        rows = list(
+            BlacklistedToken.objects.filter(token__expires_at__gt=started)
+            .values_list('pk', 'token__jti')
+        )
+        # Room to grow to twice the current size before the next rebuild
+        capacity = max(2 * len(rows), self.min_capacity)
+        bloom = BloomFilter(capacity, settings.TOKEN_BLACKLIST['FILTER_ERROR_RATE'])
+        for _, jti in rows:
+            bloom.add(jti)
+        with self._lock:
+            for jti in self._added:
+                bloom.add(jti)
+            self._bloom = bloom
+            self._last_id = max((token_id for token_id, _ in rows), default=self._last_id)
+            self._watermark = started
+            self._built_at = self._synced_at = now
+        return bloom
+
+    def _sync(self, now):
+        started = timezone.now()
+        rows = list(
+            BlacklistedToken.objects.filter(
+                pk__gt=self._last_id - self.sync_overlap,
+                blacklisted_at__gte=self._watermark - timedelta(seconds=settings.TOKEN_BLACKLIST['FILTER_SYNC_SKEW']),
+            ).values_list('pk', 'token__jti')
+        )
+        with self._lock:
+            bloom = self._bloom
+            if bloom is not None:
+                for _, jti in rows:
+                    bloom.add(jti)
+            self._last_id = max((token_id for token_id, _ in rows), default=self._last_id)
+            self._watermark = started
+            self._synced_at = now
+        return bloom
+
+
+revocation_filter = RevocationFilter()
@@ -0,0 +1,153 @@
+"""
+Full-text search over Donation.item_name and Donation.description.
+
+PostgreSQL keeps a weighted ``tsvector`` in ``Donation.search_vector`` up to date
+with a trigger and indexes it with GIN. SQLite, used for local and test runs,
+mirrors the two columns into an external-content FTS5 table maintained by
+triggers. Other databases fall back to unindexed case-insensitive substring
+matching. ``search_donations`` hides the difference from the views.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'english'
+
+FTS_TABLE = 'kindness_donation_fts'
+
+POSTGRESQL_INSTALL = [
+    f"""
+    CREATE OR REPLACE FUNCTION kindness_donation_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.item_name, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS kindness_donation_search_vector_trigger ON kindness_donation",
+    """
+    CREATE TRIGGER kindness_donation_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF item_name, description, search_vector ON kindness_donation
+    FOR EACH ROW EXECUTE FUNCTION kindness_donation_search_vector_update()
+    """,
+    "CREATE INDEX IF NOT EXISTS donation_search_vector_idx ON kindness_donation USING gin (search_vector)",
+]
+
+POSTGRESQL_BACKFILL = "UPDATE kindness_donation SET search_vector = NULL WHERE search_vector IS NULL"
+
+POSTGRESQL_UNINSTALL = [
+    "DROP INDEX IF EXISTS donation_search_vector_idx",
+    "DROP TRIGGER IF EXISTS kindness_donation_search_vector_trigger ON kindness_donation",
+    "DROP FUNCTION IF EXISTS kindness_donation_search_vector_update()",
+]
+
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON kindness_donation BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, item_name, description)
+            VALUES (new.id, new.item_name, new.description);
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON kindness_donation BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, item_name, description)
+            VALUES ('delete', old.id, old.item_name, old.description);
+        END
+    """,
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF item_name, description
+        ON kindness_donation BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, item_name, description)
+            VALUES ('delete', old.id, old.item_name, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, item_name, description)
+            VALUES (new.id, new.item_name, new.description);
+        END
+    """,
+}
+
+
+def install_search_index(connection):
+    """Create (or repair) the database objects that keep the search index current."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in POSTGRESQL_INSTALL:
+                cursor.execute(sql)
+            # Firing the trigger fills in rows that predate it.
+            cursor.execute(POSTGRESQL_BACKFILL)
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"item_name, description, content='kindness_donation', content_rowid='id', "
+                f"tokenize='porter unicode61')"
+            )
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'kindness_donation'"
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+            for name in missing:
+                cursor.execute(SQLITE_TRIGGERS[name])
+            if missing:
+                # Table rebuilds during migrations drop triggers; resync from the content table.
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in POSTGRESQL_UNINSTALL:
+                cursor.execute(sql)
+        elif connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def ensure_search_index(sender, using, **kwargs):
+    """post_migrate receiver: SQLite table rebuilds silently drop the FTS triggers."""
+    install_search_index(connections[using])
+
+
+def search_donations(queryset, query):
+    """
+    Restrict ``queryset`` to donations matching ``query`` and annotate each row
+    with a ``rank`` (higher is more relevant; item_name outweighs description).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        )
+
+    if connection.vendor == 'sqlite':
+        match = fts5_match_expression(query)
+        if not match:
+            return queryset.none()
+        # Join the FTS table once: MATCH selects the rows and bm25() ranks them in
+        # the same scan, rather than in a correlated subquery per candidate row.
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE} MATCH %s", f"{FTS_TABLE}.rowid = {queryset.model._meta.db_table}.id"],
+            params=[match],
+        ).annotate(rank=RawSQL(f"-bm25({FTS_TABLE}, 10.0, 1.0)", (), output_field=FloatField()))
+
+    # No full-text index elsewhere: scan with LIKE, ranking item_name matches first.
+    return queryset.filter(Q(item_name__icontains=query) | Q(description__icontains=query)).annotate(
+        rank=Case(
+            When(item_name__icontains=query, then=Value(2.0)),
+            default=Value(1.0),
+            output_field=FloatField(),
+        )
+    )
+
+
+def fts5_match_expression(query):
+    """Quote every word so user input can never be parsed as FTS5 query syntax."""
+    return ' '.join(f'"{term}"' for term in re.findall(r'\w+', query))
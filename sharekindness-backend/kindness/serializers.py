@@ -1,5 +1,13 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.files import File
 from rest_framework import serializers
-from .models import User, Donation, Request
+from .clientlogs import LEVELS
+from .images import variant_urls
+from .models import User, Donation, Request, Upload
+from .search import search_donations
+from .uploads import discard
 
 
 # ---------------------------
@@ -9,14 +17,18 @@ class UserSerializer(serializers.ModelSerializer):
     profile_picture = serializers.ImageField(
         max_length=None, use_url=True, allow_null=True, required=False
     )
+    profile_picture_variants = serializers.SerializerMethodField()  # Resized copies, null until generated
 
     class Meta:
         model = User
         fields = [
-            'id', 'username', 'email', 'profile_picture', 
+            'id', 'username', 'email', 'profile_picture', 'profile_picture_variants',
             'phone_number', 'city', 'state', 'bio'
         ]
 
+    def get_profile_picture_variants(self, obj):
+        return variant_urls(obj.profile_picture, obj.profile_picture_variants, self.context.get('request'))
+
     def update(self, instance, validated_data):
         instance.username = validated_data.get('username', instance.username)
         instance.email = validated_data.get('email', instance.email)
@@ -67,28 +79,75 @@ class DonationSerializer(serializers.ModelSerializer):
     donor = UserSerializer(read_only=True)  # Donor details are read-only
     donor_name = serializers.CharField(source='donor.username', read_only=True)  # Donor username
     claimed_by = serializers.SerializerMethodField()  # ✅ NEW: List of claimed recipients
+    image_variants = serializers.SerializerMethodField()  # Resized copies, null until generated
+    upload_id = serializers.UUIDField(write_only=True, required=False)  # Completed resumable upload
 
     class Meta:
         model = Donation
         fields = [
             'id', 'donor', 'donor_name', 'item_name', 'description', 
-            'category', 'quantity', 'image', 'status', 'created_at', 'claimed_by'
+            'category', 'quantity', 'image', 'image_variants', 'status', 'created_at', 'claimed_by',
+            'upload_id'
         ]
 
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image, obj.image_variants, self.context.get('request'))
+
     def get_claimed_by(self, obj):
         """
         Returns a list of usernames who have claimed the donation.
         """
-        claimed_requests = obj.requests.filter(status="CLAIMED")  # Get all CLAIMED requests
+        claimed_requests = getattr(obj, 'claimed_requests', None)  # Prefetched by with_related()
+        if claimed_requests is None:
+            claimed_requests = obj.requests.filter(status="CLAIMED").select_related('user')
         return [req.user.username for req in claimed_requests]  # Extract usernames
 
     def validate(self, data):
-        # Ensure at least one image is provided in the request
+        # Ensure at least one image is provided in the request, directly or as a resumable upload
         request = self.context.get("request")
-        if not request or not request.FILES.get('image'):
+        upload_id = data.pop('upload_id', None)
+        if upload_id is not None and request:
+            uploads = self.context.get('uploads')  # Completed uploads preloaded for a batch
+            if uploads is not None:
+                data['upload'] = uploads.get(upload_id)
+            else:
+                data['upload'] = Upload.objects.filter(
+                    pk=upload_id, user=request.user, status='COMPLETE'
+                ).first()
+            if data['upload'] is None:
+                raise serializers.ValidationError({"upload_id": "No completed upload with this ID."})
+        elif self.instance is None and not data.get('image'):  # Updates may keep the current image
             raise serializers.ValidationError({"image": "At least one image is required."})
         return data
 
+    @staticmethod
+    def attach_upload(validated_data, files):
+        """
+        Replace a validated ``upload`` with its file as ``image``. The file is opened
+        on the ``files`` ExitStack; returns the upload so it can be discarded after saving.
+        """
+        upload = validated_data.pop('upload', None)
+        if upload is not None:
+            part = files.enter_context(open(upload.path, 'rb'))
+            validated_data['image'] = File(part, name=upload.filename)
+        return upload
+
+    def create(self, validated_data):
+        with ExitStack() as files:
+            upload = self.attach_upload(validated_data, files)
+            donation = super().create(validated_data)
+        if upload is not None:
+            discard(upload)
+        return donation
+
+    def update(self, instance, validated_data):
+        with ExitStack() as files:
+            upload = self.attach_upload(validated_data, files)
+            donation = super().update(instance, validated_data)
+        if upload is not None:
+            discard(upload)
+        return donation
+
     def validate_category(self, value):
         valid_choices = [choice[0] for choice in Donation.CATEGORY_CHOICES]
         if value not in valid_choices:
@@ -96,6 +155,95 @@ class DonationSerializer(serializers.ModelSerializer):
         return value
 
 
+# ---------------------------
+# Donation Filter Serializer
+# ---------------------------
+class DonationFilterSerializer(serializers.Serializer):
+    """
+    Validates the query parameters accepted by the donation list and applies them.
+    Lookups are exact so they stay on the composite indexes declared on the models.
+    """
+    category = serializers.ChoiceField(choices=Donation.CATEGORY_CHOICES, required=False)
+    status = serializers.ChoiceField(choices=Donation.STATUS_CHOICES, required=False)
+    city = serializers.CharField(max_length=50, required=False)
+    state = serializers.CharField(max_length=50, required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    q = serializers.CharField(max_length=200, required=False, allow_blank=True)
+
+    FIELD_LOOKUPS = {
+        'category': 'category',
+        'status': 'status',
+        'city': 'donor__city',
+        'state': 'donor__state',
+        'created_after': 'created_at__gte',
+        'created_before': 'created_at__lt',
+    }
+
+    def validate(self, data):
+        if 'created_after' in data and 'created_before' in data \
+                and data['created_after'] >= data['created_before']:
+            raise serializers.ValidationError("created_after must be earlier than created_before.")
+        return data
+
+    @property
+    def search_query(self):
+        return self.validated_data.get('q', '').strip()
+
+    def filter_queryset(self, queryset):
+        lookups = {
+            self.FIELD_LOOKUPS[field]: value
+            for field, value in self.validated_data.items()
+            if field in self.FIELD_LOOKUPS
+        }
+        queryset = queryset.filter(**lookups)
+        if self.search_query:
+            queryset = search_donations(queryset, self.search_query)
+        return queryset
+
+
+# ---------------------------
+# Upload Serializer
+# ---------------------------
+class UploadSerializer(serializers.ModelSerializer):
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$')
+
+    class Meta:
+        model = Upload
+        fields = ['id', 'filename', 'size', 'sha256', 'received', 'status', 'created_at']
+        read_only_fields = ['received', 'status', 'created_at']
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.UPLOADS['MAX_SIZE']:
+            raise serializers.ValidationError(
+                f"Size must be between 1 and {settings.UPLOADS['MAX_SIZE']} bytes."
+            )
+        return value
+
+    def validate_sha256(self, value):
+        return value.lower()
+
+
+# ---------------------------
+# Client Log Event Serializer
+# ---------------------------
+class ClientLogEventSerializer(serializers.Serializer):
+    """One event of a client log batch (see kindness.clientlogs)."""
+    level = serializers.ChoiceField(choices=list(LEVELS), default='info')
+    message = serializers.CharField(trim_whitespace=False)
+    source = serializers.CharField(max_length=200, required=False, allow_blank=True)  # e.g. the page or component
+    timestamp = serializers.DateTimeField(required=False)  # When the client logged it
+    context = serializers.DictField(required=False)
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict) and isinstance(data.get('level'), str):
+            data = {**data, 'level': data['level'].lower()}
+        return super().to_internal_value(data)
+
+    def validate_message(self, value):
+        return value[:settings.CLIENT_LOGS['MAX_MESSAGE_LENGTH']]
+
+
 # ---------------------------
 # Request Serializer
 # ---------------------------
@@ -48,9 +48,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'kindness.metrics.MetricsMiddleware',  # First, to time the whole stack
+    'kindness.logs.RequestIDMiddleware',  # Before anything that logs
+    'kindness.querycheck.QueryInspectionMiddleware',  # Only with QUERY_INSPECTION['MODE']
     'django.middleware.security.SecurityMiddleware',
+    'kindness.middleware.CompressionMiddleware',  # Before anything that reads or changes the body
+    'kindness.middleware.ImmutableMediaMiddleware',  # Long-lived caching of media/blobs/
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Enable CORS
+    'kindness.throttling.LoadSheddingMiddleware',  # After CORS, so browsers can read the 503
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -113,28 +119,200 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'  # Public-facing URL for accessing media files
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # Local directory where uploaded files are stored
 
+STORAGES = {
+    # Deduplicates uploads by content; names under media/blobs/ are immutable
+    'default': {
+        'BACKEND': config.get('MEDIA_STORAGE', 'kindness.storage.ContentAddressedStorage'),
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+
+# --- Bulk donation creation ---
+BULK_DONATION_MAX_ITEMS = config.get('BULK_DONATION_MAX_ITEMS', 200)
+BULK_MODERATION_MAX_ITEMS = config.get('BULK_MODERATION_MAX_ITEMS', 100)  # request_ids per approve/reject call
+
+# --- Resumable uploads (see kindness.uploads) ---
+UPLOADS = {
+    'TEMP_DIR': os.path.join(BASE_DIR, 'upload_parts'),  # Partial files; not served
+    'MAX_SIZE': config.get('UPLOAD_MAX_SIZE', 25 * 1024 * 1024),  # Bytes per file
+    'CHUNK_SIZE': 1024 * 1024,  # Chunk size suggested to clients
+    'MAX_CHUNK_SIZE': 8 * 1024 * 1024,  # Largest chunk accepted in one request
+    'EXPIRY_HOURS': 24,  # Unfinished uploads older than this are purged
+}
+
+# --- Donation expiry (see kindness.expiry) ---
+DONATION_EXPIRY = {
+    'MAX_AGE_DAYS': config.get('DONATION_MAX_AGE_DAYS', 30),  # AVAILABLE donations older than this expire
+    'CATEGORY_MAX_AGE_DAYS': {  # Shorter lifetimes for perishable categories
+        'FOOD': config.get('FOOD_DONATION_MAX_AGE_DAYS', 3),
+    },
+    'BATCH_SIZE': 500,  # Donations expired per transaction
+    # Seconds between sweeps by the in-process sweeper; 0 leaves sweeping to the
+    # expire_donations command (e.g. from cron)
+    'INTERVAL': config.get('DONATION_EXPIRY_INTERVAL', 0),
+}
+
+# --- Image derivatives (see kindness.images) ---
+IMAGE_PIPELINE = {
+    'ASYNC': config.get('IMAGE_PIPELINE_ASYNC', True),  # False runs the pipeline inline, e.g. in scripts
+    'WORKERS': config.get('IMAGE_PIPELINE_WORKERS', 2),
+    'VARIANTS': {  # Longest edge in pixels
+        'thumbnail': 160,
+        'card': 480,
+        'full': 1600,
+    },
+    'FORMATS': {  # Encoder quality
+        'webp': 80,
+        'jpeg': 82,
+    },
+}
+
+# --- Cache ---
+# Local memory by default; point the "CACHE" entry of config.json at a shared
+# backend (e.g. Redis or Memcached) when running several processes.
+CACHES = {
+    'default': config.get('CACHE', {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sharekindness',
+    }),
+}
+
+DASHBOARD_CACHE_ALIAS = 'default'
+DASHBOARD_CACHE_TIMEOUT = config.get('DASHBOARD_CACHE_TIMEOUT', 300)  # Seconds
+
+# --- Response compression (see kindness.middleware) ---
+COMPRESSION = {
+    'MIN_SIZE': config.get('COMPRESSION_MIN_SIZE', 1024),  # Smaller responses are sent as they are
+    'BROTLI_QUALITY': 5,  # Used when the brotli package is installed
+}
+
+# --- Event stream (server-sent events) ---
+# Replace with a broker shared between processes when running several workers.
+EVENT_BROKER = config.get('EVENT_BROKER', 'kindness.events.InProcessBroker')
+EVENT_STREAM = {
+    'KEEPALIVE_INTERVAL': 15,  # Seconds between keep-alive comments on an idle stream
+    'MAX_CONNECTION_AGE': 600,  # Seconds before the server ends a stream; clients reconnect
+    'RETRY_MS': 3000,  # Reconnect delay suggested to EventSource clients
+    'MAX_PENDING_EVENTS': 100,  # Events buffered per connection before dropping
+}
 
 # --- Default primary key field type ---
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # --- JWT Authentication ---
 from datetime import timedelta
+from importlib.util import find_spec
+
+# Render and parse JSON with orjson when it is installed; set "FAST_JSON": false
+# in config.json to fall back to DRF's standard library based classes.
+FAST_JSON = config.get('FAST_JSON', True) and find_spec('orjson') is not None
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'kindness.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson-backed JSON when the package is installed (see FAST_JSON)
+    'DEFAULT_RENDERER_CLASSES': (
+        'kindness.renderers.ORJSONRenderer' if FAST_JSON else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'kindness.parsers.ORJSONParser' if FAST_JSON else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'kindness.throttling.TokenBucketThrottle',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'kindness.pagination.KeysetPagination',
+    'PAGE_SIZE': config.get('PAGE_SIZE', 20),
 }
 
+# --- Throttling and load shedding (see kindness.throttling) ---
+THROTTLING = {
+    # LocalBucketBackend limits each process separately; CacheBucketBackend shares
+    # the limits through CACHE_ALIAS, which then needs a cache such as Redis.
+    'BACKEND': config.get('THROTTLE_BACKEND', 'kindness.throttling.LocalBucketBackend'),
+    'CACHE_ALIAS': 'default',
+    # throttle_scope -> (rate, burst) per client; None (or a missing scope) is unthrottled
+    'RATES': {
+        'default': None,
+        'login': ('10/min', 5),  # Login and token endpoints, which hash the password
+        'register': ('5/hour', 3),
+        'password': ('5/hour', 3),
+        'logs': ('60/min', 20),  # Unauthenticated writes
+        **config.get('THROTTLE_RATES', {}),
+    },
+}
+
+LOAD_SHEDDING = {
+    'MAX_IN_FLIGHT': config.get('MAX_IN_FLIGHT_REQUESTS', 200),  # Per process; 0 disables
+    'LATENCY_THRESHOLD_MS': config.get('LATENCY_THRESHOLD_MS', 0),  # Moving average; 0 disables
+    'MAX_SHED_RATIO': 0.9,  # Share of requests refused at most while slow
+    'RETRY_AFTER': 1,  # Seconds
+    'EXEMPT_PATHS': ('/admin/', '/api/events/', '/metrics/'),
+}
+
+# --- N+1 detection and query budgets (see kindness.querycheck) ---
+QUERY_INSPECTION = {
+    # None (off), 'raise' (development and tests) or 'log' (staging)
+    'MODE': config.get('QUERY_INSPECTION', None),
+    'REPEAT_THRESHOLD': 3,  # Queries of one shape in a request that count as N+1
+}
+
+# --- Request metrics (see kindness.metrics) ---
+METRICS = {
+    'ENABLED': config.get('METRICS_ENABLED', True),
+    # Bearer token required by /metrics/; without one it is only served with DEBUG
+    'TOKEN': config.get('METRICS_TOKEN'),
+    'LATENCY_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),  # Seconds
+    'SIZE_BUCKETS': (256, 1024, 4096, 16384, 65536, 262144, 1048576),  # Bytes
+    'QUERY_BUCKETS': (0, 1, 2, 3, 5, 10, 20, 50, 100),
+}
+
+# Serve the read endpoints with async views (kindness.views.base.read_view).
+# Only worth enabling when running under kindness.asgi.
+ASYNC_READ_VIEWS = config.get('ASYNC_READ_VIEWS', False)
+
+# Upper bound for the ?page_size= query parameter on list endpoints
+MAX_PAGE_SIZE = config.get('MAX_PAGE_SIZE', 100)
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=config.get('ACCESS_TOKEN_LIFETIME', 60)),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=config.get('REFRESH_TOKEN_LIFETIME', 7)),
     'ROTATE_REFRESH_TOKENS': config.get('ROTATE_REFRESH_TOKENS', True),
     'BLACKLIST_AFTER_ROTATION': config.get('BLACKLIST_AFTER_ROTATION', True),
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_OBTAIN_SERIALIZER': 'kindness.authentication.VersionedTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'kindness.authentication.VersionedTokenRefreshSerializer',
+}
+
+# --- Token blacklist maintenance (see kindness.revocation) ---
+TOKEN_BLACKLIST = {
+    'PRUNE_BATCH_SIZE': 1000,  # Expired outstanding tokens deleted per transaction
+    # Seconds between prunes by the in-process sweeper; 0 leaves pruning to the
+    # prune_tokens command (e.g. from cron)
+    'PRUNE_INTERVAL': config.get('TOKEN_PRUNE_INTERVAL', 0),
+    # Seconds before a token blacklisted by another process is seen by the
+    # revocation filter; 0 disables the filter and queries the blacklist on every check
+    'FILTER_SYNC_INTERVAL': config.get('REVOCATION_FILTER_SYNC_INTERVAL', 5),
+    'FILTER_REBUILD_INTERVAL': 3600,  # Seconds between full rebuilds, which drop expired tokens
+    # Seconds a sync looks back past the previous one, covering rows whose transaction
+    # committed late and clock differences between servers
+    'FILTER_SYNC_SKEW': 30,
+    'FILTER_ERROR_RATE': 0.01,  # Share of unrevoked tokens still looked up in the blacklist
+}
+
+# Per-process cache of users resolved from access tokens (see kindness.authentication)
+AUTH_USER_CACHE = {
+    'TTL': config.get('AUTH_USER_CACHE_TTL', 30),  # Seconds another process may serve a stale profile
+    'MAX_SIZE': 10000,  # Users kept per process
 }
 
 # --- CORS Configuration ---
@@ -149,33 +327,99 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = config.get('CORS_ALLOW_CREDENTIALS', True)
 
-# --- Logging Configuration ---
+# --- Client log ingestion (see kindness.clientlogs) ---
+CLIENT_LOGS = {
+    'MAX_EVENTS': 100,  # Events per LogBatchView request
+    'MAX_BODY_BYTES': 256 * 1024,  # Larger batches are refused with 413 before parsing
+    'MAX_MESSAGE_LENGTH': 2000,  # Longer messages are truncated
+    # Share of the events of each level that is logged; the rest are dropped
+    'SAMPLE_RATES': {
+        'debug': 0.1,
+        'info': 1.0,
+        'warning': 1.0,
+        'error': 1.0,
+        'critical': 1.0,
+        **config.get('CLIENT_LOG_SAMPLE_RATES', {}),
+    },
+}
+
+# --- Logging (see kindness.logs) ---
+# 'json' writes one JSON object per record; 'text' the verbose line format
+LOG_FORMAT = config.get('LOG_FORMAT', 'text' if DEBUG else 'json')
+# Handlers of the root logger, which every logger below propagates to
+LOG_HANDLERS = config.get('LOG_HANDLERS', ['file'])
+LOG_LEVELS = {
+    'django': 'INFO',
+    'django.db.backends': 'WARNING',  # DEBUG would log the SQL of every query
+    'django.request': 'ERROR',  # Not a WARNING per 4xx response; handle_error logs those, rate-limited
+    'django.utils.autoreload': 'WARNING',
+    'kindness': 'INFO',
+    **config.get('LOG_LEVELS', {}),
+}
+# handle_error logs each distinct message at most PER_INTERVAL times per INTERVAL seconds
+LOG_RATE_LIMIT = {
+    'PER_INTERVAL': 10,
+    'INTERVAL': 60,
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {'()': 'kindness.logs.RequestIDFilter'},
+    },
     'formatters': {
         'verbose': {
-            'format': '{levelname} {asctime} {module} {message}',
+            'format': '{levelname} {asctime} {request_id} {module} {message}',
             'style': '{',  # Use Python's str.format() style
         },
         'simple': {
             'format': '{levelname} {message}',
             'style': '{',  # Use Python's str.format() style
         },
+        'json': {
+            '()': 'kindness.logs.JSONFormatter',
+        },
     },
     'handlers': {
+        # Written by background threads; records wait in a queue of 'capacity'
+        # and are dropped, not waited for, while the writer catches up
         'file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': os.path.join(BASE_DIR, 'debug.log'),
-            'formatter': 'verbose',
+            'class': 'kindness.logs.BackgroundFileHandler',
+            'filename': config.get('LOG_FILE', os.path.join(BASE_DIR, 'debug.log')),
+            'maxBytes': 50 * 1024 * 1024,
+            'backupCount': 5,
+            'capacity': 10000,
+            'filters': ['request_id'],
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'verbose',
         },
+        'console': {
+            'class': 'kindness.logs.BackgroundStreamHandler',
+            'capacity': 10000,
+            'filters': ['request_id'],
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'verbose',
+        },
+        'client_file': {
+            # Client events (see kindness.clientlogs); rotated at 10 MB, keeping 5 files
+            'class': 'kindness.logs.BackgroundFileHandler',
+            'filename': os.path.join(BASE_DIR, 'client.log'),
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'capacity': 10000,
+            'filters': ['request_id'],
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'verbose',
+        },
+    },
+    'root': {
+        'handlers': LOG_HANDLERS,
+        'level': 'WARNING',
     },
     'loggers': {
-        'django': {
-            'handlers': ['file'],
+        **{name: {'level': level} for name, level in LOG_LEVELS.items()},
+        'kindness.client': {
+            'handlers': ['client_file'],
             'level': 'DEBUG',
-            'propagate': True,
+            'propagate': False,
         },
     },
 }
@@ -0,0 +1,180 @@
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import user_cache
+from .cache import dashboard_cache
+from .counters import adjust_pending_counters, donor_id_for, release_admission
+from .events import publish, request_event
+from .images import delete_derivatives, schedule_derivatives
+from .models import Donation, Request, User
+from .revocation import revocation_filter
+
+def dashboard_users_for_donations(donation_ids):
+    """Everyone whose dashboard embeds one of ``donation_ids``: donors and requesters."""
+    donors = Donation.objects.filter(pk__in=donation_ids).values_list('donor_id', flat=True)
+    requesters = Request.objects.filter(donation_id__in=donation_ids).values_list('user_id', flat=True)
+    return set(donors) | set(requesters)
+
+
+@receiver(post_save, sender=Donation)
+def invalidate_dashboards_on_donation_save(sender, instance, **kwargs):
+    dashboard_cache.invalidate(dashboard_users_for_donations([instance.pk]) | {instance.donor_id})
+
+
+@receiver(pre_delete, sender=Donation)
+def invalidate_dashboards_on_donation_delete(sender, instance, **kwargs):
+    # Collected before the delete, while the requests still exist.
+    dashboard_cache.invalidate(dashboard_users_for_donations([instance.pk]) | {instance.donor_id})
+
+
+@receiver(post_save, sender=Request)
+@receiver(post_delete, sender=Request)
+def invalidate_dashboards_on_request_change(sender, instance, **kwargs):
+    dashboard_cache.invalidate(dashboard_users_for_donations([instance.donation_id]) | {instance.user_id})
+
+
+def dashboard_users_for_profile(user_id):
+    """Everyone whose dashboard embeds the profile of ``user_id``."""
+    donation_ids = set(Donation.objects.filter(donor_id=user_id).values_list('pk', flat=True))
+    donation_ids |= set(Request.objects.filter(user_id=user_id).values_list('donation_id', flat=True))
+    return dashboard_users_for_donations(donation_ids) | {user_id}
+
+
+def profile_changed(user_id):
+    """Invalidate everything that embeds the profile of ``user_id``."""
+    user_cache.invalidate(user_id)  # The derivative pipeline updates the row without a post_save
+    dashboard_cache.invalidate(dashboard_users_for_profile(user_id))
+    # Donations render their donor and the usernames of their claimers.
+    Donation.objects.filter(
+        Q(donor_id=user_id) | Q(requests__user_id=user_id, requests__status='CLAIMED')
+    ).touch()
+
+
+@receiver(post_save, sender=User)
+def invalidate_dashboards_on_profile_change(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not set(User.DASHBOARD_FIELDS) & set(update_fields)):
+        return  # e.g. the last_login update on every login
+    # Full saves list every field in update_fields (see ProtectsCounterFields); compare the values.
+    loaded = getattr(instance, '_loaded_profile', None)
+    instance._loaded_profile = instance.profile_snapshot()
+    if loaded == instance._loaded_profile:
+        return  # e.g. a password change
+    profile_changed(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Password changes, profile updates and deletions; last_login updates too, harmlessly.
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Donation)
+def build_donation_image_derivatives(sender, instance, **kwargs):
+    schedule_derivatives(
+        instance, 'image', 'image_variants',
+        on_done=lambda pk: dashboard_cache.invalidate(dashboard_users_for_donations([pk])),
+    )
+
+
+@receiver(post_save, sender=User)
+def build_profile_picture_derivatives(sender, instance, **kwargs):
+    schedule_derivatives(instance, 'profile_picture', 'profile_picture_variants', on_done=profile_changed)
+
+
+# Who hears about each request status transition: the requester or the donor
+STATUS_EVENT_RECIPIENTS = {
+    'APPROVED': 'requester',
+    'REJECTED': 'requester',
+    'CLAIMED': 'donor',
+}
+
+
+@receiver(post_save, sender=Request)
+def handle_request_status_change(sender, instance, created, **kwargs):
+    """Keep the notification counters current and push the transition to the stream."""
+    previous = None if created else getattr(instance, '_loaded_status', None)
+    instance._loaded_status = instance.status
+    if previous == instance.status:
+        return
+
+    if 'CLAIMED' in (previous, instance.status):
+        Donation.objects.filter(pk=instance.donation_id).touch()  # Its claimed_by changed
+
+    donor_id = donor_id_for(instance)
+    was_pending = previous == 'PENDING'
+    is_pending = instance.status == 'PENDING'
+    if was_pending != is_pending:
+        adjust_pending_counters([(instance.user_id, donor_id)], 1 if is_pending else -1)
+
+    if created:
+        event_type, recipient = 'request.created', donor_id
+    elif instance.status in STATUS_EVENT_RECIPIENTS:
+        event_type = f'request.{instance.status.lower()}'
+        recipient = instance.user_id if STATUS_EVENT_RECIPIENTS[instance.status] == 'requester' else donor_id
+    else:
+        return
+    publish([recipient], request_event(event_type, instance.pk, instance.donation_id, instance.status))
+
+
+@receiver(post_delete, sender=Request)
+def update_counters_on_request_delete(sender, instance, **kwargs):
+    if instance.status == 'PENDING':
+        adjust_pending_counters([(instance.user_id, donor_id_for(instance))], -1)
+    release_admission(instance.donation_id)
+    if instance.status == 'CLAIMED':
+        Donation.objects.filter(pk=instance.donation_id).touch()
+
+
+def release_replaced_file(instance, field, update_fields=None):
+    """
+    Release the storage reference of a file that ``instance.<field>`` no longer
+    points to. A file stored again with the same bytes keeps its name but took
+    a reference of its own, so the previous one is released then too.
+    """
+    if update_fields is not None and field not in update_fields:
+        return
+    loaded = getattr(instance, '_loaded_files', {})
+    current = getattr(instance, field).name or None
+    previous = loaded.get(field)
+    stored = getattr(instance, '_stored_files', set())
+    if previous and (previous != current or field in stored):
+        getattr(instance, field).storage.delete(previous)
+    loaded[field] = current
+    instance._loaded_files = loaded
+    stored.discard(field)
+
+
+def release_files(field_file, variants):
+    if field_file:
+        delete_derivatives(field_file.storage, variants)
+        field_file.storage.delete(field_file.name)
+
+
+@receiver(post_save, sender=Donation)
+def release_replaced_donation_image(sender, instance, update_fields=None, **kwargs):
+    release_replaced_file(instance, 'image', update_fields)
+
+
+@receiver(post_save, sender=User)
+def release_replaced_profile_picture(sender, instance, update_fields=None, **kwargs):
+    release_replaced_file(instance, 'profile_picture', update_fields)
+
+
+@receiver(post_delete, sender=Donation)
+def release_donation_image(sender, instance, **kwargs):
+    release_files(instance.image, instance.image_variants)
+
+
+@receiver(post_delete, sender=User)
+def release_profile_picture(sender, instance, **kwargs):
+    release_files(instance.profile_picture, instance.profile_picture_variants)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_to_revocation_filter(sender, instance, created, **kwargs):
+    # Logout, rotation on refresh or the admin; visible to other processes at their next sync
+    if created:
+        revocation_filter.add(instance.token.jti)
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import tempfile
+from collections import Counter, defaultdict
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Deduplicating media storage.
+
+    Uploads are hashed with SHA-256 while they are streamed to a temporary file
+    and stored once under ``blobs/<aa>/<bb>/<digest><ext>``, whatever name or
+    upload_to directory they arrived with. Identical uploads therefore share one
+    file, and a name always refers to the same bytes, so its URL can be cached
+    forever (see kindness.middleware.ImmutableMediaMiddleware).
+
+    Every ``save()`` takes a reference on the blob (tracked in ``MediaBlob``) and
+    every ``delete()`` releases one; the file is removed with the last reference.
+    Names that predate this storage have no ``MediaBlob`` row and are never
+    deleted.
+    """
+    blob_directory = 'blobs'
+    chunk_size = 64 * 1024
+
+    def _save(self, name, content):
+        return self.save_many([(name, content)])[0]
+
+    def save_many(self, files):
+        """
+        Store each ``(name, content)`` pair as ``save()`` would and return the
+        stored names, in order, taking every reference with three queries
+        whatever the number of files.
+        """
+        from .models import MediaBlob
+
+        os.makedirs(self.location, exist_ok=True)
+        staged = []  # (temporary path, blob name)
+        sizes = {}
+        try:
+            for name, content in files:
+                temp_path, blob_name, size = self._stage(self.get_available_name(name), content)
+                staged.append((temp_path, blob_name))
+                sizes[blob_name] = size
+            references = Counter(blob_name for _, blob_name in staged)
+            with transaction.atomic():
+                # Sorted, so concurrent batches lock the rows in the same order.
+                names = sorted(references)
+                MediaBlob.objects.bulk_create(
+                    [MediaBlob(name=blob_name, size=sizes[blob_name]) for blob_name in names], ignore_conflicts=True
+                )
+                list(MediaBlob.objects.select_for_update().filter(name__in=names).order_by('name').values_list('pk'))
+                for temp_path, blob_name in staged:
+                    path = self.path(blob_name)
+                    if not os.path.exists(path):
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        if self.file_permissions_mode is not None:
+                            os.chmod(temp_path, self.file_permissions_mode)
+                        os.replace(temp_path, path)
+                by_count = defaultdict(list)
+                for blob_name, count in references.items():
+                    by_count[count].append(blob_name)
+                for count, blob_names in by_count.items():
+                    MediaBlob.objects.filter(name__in=blob_names).update(ref_count=F('ref_count') + count)
+        finally:
+            for temp_path, _ in staged:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        return [blob_name for _, blob_name in staged]
+
+    def _stage(self, name, content):
+        """Hash ``content`` into a temporary file; returns its path, the blob name and the size."""
+        digest = hashlib.sha256()
+        size = 0
+        # Same directory as the final file, so the rename into place stays atomic.
+        fd, temp_path = tempfile.mkstemp(dir=self.location, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks(self.chunk_size):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    temp_file.write(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return temp_path, self.blob_name(digest.hexdigest(), name), size
+
+    def blob_name(self, hexdigest, original_name):
+        extension = os.path.splitext(original_name)[1].lower()
+        return '/'.join([self.blob_directory, hexdigest[:2], hexdigest[2:4], hexdigest + extension])
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from content, so an existing name is a match, not a clash.
+        return name
+
+    def delete(self, name):
+        from .models import MediaBlob
+
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                return  # Legacy file: never reference-counted, never deleted.
+            MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+            if blob.ref_count == 1:
+                # The row stays, at zero references, until the file is gone; after a rollback nothing is removed.
+                transaction.on_commit(lambda: self._delete_unreferenced(name))
+
+    def _delete_unreferenced(self, name):
+        from .models import MediaBlob
+
+        # The row lock makes a concurrent save of the same bytes wait until both the
+        # file and the row are gone (it then writes the file again), or, if it took a
+        # reference first, keeps the file.
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.ref_count == 0:
+                super().delete(name)
+                blob.delete()
+
+
+def save_files(storage, files):
+    """``storage.save()`` every ``(name, content)`` pair, as one batch where the storage supports it."""
+    if isinstance(storage, ContentAddressedStorage):
+        return storage.save_many(files)
+    return [storage.save(name, content) for name, content in files]
@@ -0,0 +1,277 @@
+"""
+Reproducible synthetic data for benchmarks (see the ``generate_data`` and
+``run_benchmark`` commands).
+
+``generate`` fills an empty database with users, donations and requests drawn
+from a seeded random generator, so the same arguments give the same rows on
+SQLite and PostgreSQL and branches can be compared on equal data. Rows are
+inserted with ``bulk_create`` in batches, bypassing signals; the denormalized
+counters are rebuilt at the end. Timestamps are spread over ``days`` before
+today (midnight, so reruns on one day match), AVAILABLE donations within their
+expiry window.
+
+Donation statuses and their requests are kept consistent:
+
+- AVAILABLE: PENDING and REJECTED requests,
+- RESERVED: one APPROVED request, the others REJECTED,
+- CLAIMED: one CLAIMED request, the others REJECTED,
+- EXPIRED and CLOSED: REJECTED requests only.
+
+Images come from a small pool of generated JPEGs saved through the media
+storage, with their derivatives, and are shared by many donations and profile
+pictures; ``MediaBlob`` reference counts are set to match.
+"""
+import io
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from .counters import rebuild_admitted_requests, rebuild_pending_counters
+from .images import build_derivatives
+from .models import Donation, MediaBlob, Request, User
+
+USERNAME_PREFIX = 'synth-'
+EMAIL_DOMAIN = 'synthetic.example.com'
+PASSWORD = 'synthetic-password'  # Of every synthetic user
+
+CITIES = [
+    ('New York', 'NY'), ('Buffalo', 'NY'), ('Los Angeles', 'CA'), ('San Francisco', 'CA'), ('San Diego', 'CA'),
+    ('Chicago', 'IL'), ('Springfield', 'IL'), ('Houston', 'TX'), ('Austin', 'TX'), ('Dallas', 'TX'),
+    ('Phoenix', 'AZ'), ('Philadelphia', 'PA'), ('Pittsburgh', 'PA'), ('Seattle', 'WA'), ('Spokane', 'WA'),
+    ('Denver', 'CO'), ('Boston', 'MA'), ('Atlanta', 'GA'), ('Miami', 'FL'), ('Orlando', 'FL'),
+    ('Portland', 'OR'), ('Detroit', 'MI'), ('Minneapolis', 'MN'), ('Nashville', 'TN'),
+]
+
+ITEMS = {
+    'FOOD': ['Canned beans', 'Rice', 'Pasta', 'Bread', 'Apples', 'Baby formula', 'Cereal', 'Soup'],
+    'CLOTHES': ['Winter coat', 'Sweater', 'Jeans', 'T-shirts', 'Rain jacket', 'Scarf', 'School uniform'],
+    'SHOES': ['Running shoes', 'Boots', 'Sandals', 'Sneakers', 'Slippers', 'Dress shoes'],
+    'BOOKS': ['Novel', 'Textbook', 'Picture books', 'Cookbook', 'Dictionary', 'Comics', 'Atlas'],
+    'ELECTRONICS': ['Laptop', 'Phone charger', 'Headphones', 'Tablet', 'Monitor', 'Radio', 'Keyboard'],
+    'OTHER': ['Stroller', 'Desk lamp', 'Blankets', 'Toys', 'Kitchen set', 'Backpack', 'Bicycle'],
+}
+CATEGORY_WEIGHTS = {'FOOD': 25, 'CLOTHES': 25, 'SHOES': 10, 'BOOKS': 15, 'ELECTRONICS': 10, 'OTHER': 15}
+CONDITIONS = ['Brand new', 'Like new', 'Gently used', 'Used', 'Well loved']
+DESCRIPTIONS = [
+    '{condition}, {quantity} available. Pick up in {city}.',
+    '{condition} {item}, happy to give it to someone who needs it.',
+    'Moving out of {city}, {item} has to go. {condition}.',
+    '{quantity} x {item}. {condition}, from a smoke-free home.',
+]
+STATUS_WEIGHTS = {'AVAILABLE': 60, 'RESERVED': 10, 'CLAIMED': 15, 'EXPIRED': 10, 'CLOSED': 5}
+PENDING_SHARE = 0.7  # Of the requests on AVAILABLE donations; the rest were rejected
+PROFILE_PICTURE_SHARE = 0.3
+IMAGE_SHARE = 0.8  # Of donations with an image
+IMAGE_SIZE = (1024, 768)
+
+
+def synthetic_users():
+    return User.objects.filter(username__startswith=USERNAME_PREFIX)
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let ``auto_now``/``auto_now_add`` fields of ``models`` be set by the caller."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Generator:
+    """One generation run; see ``generate``."""
+
+    def __init__(self, users, donations, requests, images, seed, days, batch_size, progress):
+        self.rng = random.Random(seed)
+        self.counts = {'users': users, 'donations': donations, 'requests': requests, 'images': images}
+        self.days = days
+        self.batch_size = batch_size
+        self.progress = progress
+        self.now = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        # Chance that each of a donation's MAX_REQUESTS slots is taken, for ``requests`` on average
+        self.request_rate = min(requests / max(donations, 1) / Donation.MAX_REQUESTS, 1.0)
+        self.user_ids = []
+        self.pool = []  # [(source name, variants)]
+        self.usage = []  # References to each pool image
+
+    def run(self):
+        self.make_image_pool()
+        with explicit_timestamps(User, Donation, Request):
+            self.make_users()
+            self.make_donations()
+        self.settle_image_references()
+        rebuild_pending_counters()
+        rebuild_admitted_requests()
+        return self.counts
+
+    def make_image_pool(self):
+        storage = Donation._meta.get_field('image').storage
+        for index in range(self.counts['images']):
+            source = storage.save(f'donation_images/synthetic-{index}.jpg', ContentFile(self.draw_image()))
+            self.pool.append((source, build_derivatives(storage, source)))
+            self.usage.append(0)
+        self.report(f"{len(self.pool)} images")
+
+    def draw_image(self):
+        rng = self.rng
+        image = Image.new('RGB', IMAGE_SIZE, tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(40):
+            x, y = rng.randrange(IMAGE_SIZE[0]), rng.randrange(IMAGE_SIZE[1])
+            box = (x, y, x + rng.randrange(20, 400), y + rng.randrange(20, 300))
+            shape = draw.ellipse if rng.random() < 0.5 else draw.rectangle
+            shape(box, fill=tuple(rng.randrange(256) for _ in range(3)))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=85)
+        return buffer.getvalue()
+
+    def pick_image(self, share):
+        """``(source, variants)`` of a pool image, or ``(None, {})`` for ``1 - share`` of the calls."""
+        if not self.pool or self.rng.random() >= share:
+            return None, {}
+        index = self.rng.randrange(len(self.pool))
+        self.usage[index] += 1
+        return self.pool[index]
+
+    def make_users(self):
+        rng = self.rng
+        password = make_password(PASSWORD)
+        joined_span = self.days * 86400
+        for start in range(0, self.counts['users'], self.batch_size):
+            batch = []
+            for index in range(start, min(start + self.batch_size, self.counts['users'])):
+                city, state = rng.choice(CITIES)
+                picture, variants = self.pick_image(PROFILE_PICTURE_SHARE)
+                joined = self.now - timedelta(seconds=rng.randrange(joined_span))
+                batch.append(User(
+                    username=f'{USERNAME_PREFIX}{index}',
+                    email=f'{USERNAME_PREFIX}{index}@{EMAIL_DOMAIN}',
+                    password=password,
+                    first_name=f'User{index}',
+                    city=city,
+                    state=state,
+                    bio=f'Sharing what I can in {city}.' if rng.random() < 0.5 else None,
+                    is_verified=rng.random() < 0.4,
+                    profile_picture=picture,
+                    profile_picture_variants=variants,
+                    date_joined=joined,
+                    updated_at=joined,
+                ))
+            self.user_ids.extend(user.pk for user in User.objects.bulk_create(batch))
+            self.report(f"{len(self.user_ids)}/{self.counts['users']} users")
+
+    def make_donations(self):
+        created_requests = 0
+        statuses, status_weights = zip(*STATUS_WEIGHTS.items())
+        categories, category_weights = zip(*CATEGORY_WEIGHTS.items())
+        for start in range(0, self.counts['donations'], self.batch_size):
+            size = min(self.batch_size, self.counts['donations'] - start)
+            batch = [
+                self.donation(category, status)
+                for category, status in zip(
+                    self.rng.choices(categories, category_weights, k=size),
+                    self.rng.choices(statuses, status_weights, k=size),
+                )
+            ]
+            donations = Donation.objects.bulk_create(batch)
+            requests = [request for donation in donations for request in self.requests_for(donation)]
+            for offset in range(0, len(requests), self.batch_size):
+                Request.objects.bulk_create(requests[offset:offset + self.batch_size])
+            created_requests += len(requests)
+            self.report(f"{start + size}/{self.counts['donations']} donations, {created_requests} requests")
+        self.counts['requests'] = created_requests
+
+    def donation(self, category, status):
+        rng = self.rng
+        item = rng.choice(ITEMS[category])
+        city, _ = rng.choice(CITIES)
+        quantity = rng.randint(1, 5)
+        if status == 'AVAILABLE':
+            options = settings.DONATION_EXPIRY
+            max_age = options['CATEGORY_MAX_AGE_DAYS'].get(category, options['MAX_AGE_DAYS'])
+            age = rng.randrange(min(max_age, self.days) * 86400)
+        else:
+            age = rng.randrange(self.days * 86400)
+        created = self.now - timedelta(seconds=age)
+        image, variants = self.pick_image(IMAGE_SHARE)
+        return Donation(
+            donor_id=rng.choice(self.user_ids),
+            item_name=f'{item} ({rng.choice(CONDITIONS).lower()})',
+            description=rng.choice(DESCRIPTIONS).format(
+                condition=rng.choice(CONDITIONS), quantity=quantity, city=city, item=item.lower()
+            ),
+            category=category,
+            quantity=quantity,
+            image=image,
+            image_variants=variants,
+            status=status,
+            created_at=created,
+            updated_at=created,
+        )
+
+    def requests_for(self, donation):
+        rng = self.rng
+        slots = sum(rng.random() < self.request_rate for _ in range(Donation.MAX_REQUESTS))
+        requesters = [user_id for user_id in rng.sample(self.user_ids, min(slots + 1, len(self.user_ids)))
+                      if user_id != donation.donor_id][:slots]
+        elapsed = max(int((self.now - donation.created_at).total_seconds()), 1)
+        requests = []
+        for index, user_id in enumerate(requesters):
+            if donation.status == 'AVAILABLE':
+                status = 'PENDING' if rng.random() < PENDING_SHARE else 'REJECTED'
+            elif index == 0 and donation.status in ('RESERVED', 'CLAIMED'):
+                status = 'APPROVED' if donation.status == 'RESERVED' else 'CLAIMED'
+            else:
+                status = 'REJECTED'
+            created = donation.created_at + timedelta(seconds=rng.randrange(elapsed))
+            requests.append(Request(
+                user_id=user_id,
+                donation=donation,
+                status=status,
+                requested_quantity=rng.randint(1, donation.quantity),
+                comments='Would really help, thank you!' if rng.random() < 0.3 else None,
+                created_at=created,
+                updated_at=created,
+            ))
+        return requests
+
+    def settle_image_references(self):
+        """Each save took one reference; make it one per row using the image, or release unused ones."""
+        storage = Donation._meta.get_field('image').storage
+        for (source, variants), uses in zip(self.pool, self.usage):
+            names = [source] + [
+                entry[fmt] for entry in variants['variants'].values() for fmt in settings.IMAGE_PIPELINE['FORMATS']
+            ]
+            if uses:
+                MediaBlob.objects.filter(name__in=names).update(ref_count=F('ref_count') + uses - 1)
+            else:
+                for name in names:
+                    storage.delete(name)
+
+    def report(self, message):
+        if self.progress is not None:
+            self.progress(message)
+
+
+def generate(users, donations, requests, images=12, seed=0, days=90, batch_size=5000, progress=None):
+    """
+    Insert ``users`` users, ``donations`` donations and about ``requests``
+    requests (each donation takes at most ``Donation.MAX_REQUESTS``). Returns
+    the counts created; ``progress`` is called with a message after each batch.
+    """
+    return Generator(users, donations, requests, images, seed, days, batch_size, progress).run()
@@ -0,0 +1,188 @@
+"""
+Token-bucket throttling per endpoint and client, and load shedding.
+
+Views name their bucket with ``throttle_scope``; views without one share the
+``default`` scope. ``THROTTLING['RATES']`` gives each scope a ``(rate, burst)``,
+e.g. ``('10/min', 5)``: a client may make ``burst`` requests at once and then
+one every 6 seconds. A scope without a rate is not throttled. Clients are users
+when authenticated and IP addresses otherwise. Refused requests get DRF's 429
+response with Retry-After.
+
+Buckets are kept as GCRA "theoretical arrival times", one number per client
+and scope, by ``THROTTLING['BACKEND']``: LocalBucketBackend keeps them per
+process, CacheBucketBackend in a Django cache shared by all processes.
+
+LoadSheddingMiddleware answers 503 with Retry-After while more than
+``LOAD_SHEDDING['MAX_IN_FLIGHT']`` requests are in progress, or while the
+moving average latency exceeds ``LATENCY_THRESHOLD_MS``.
+"""
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """``'10/min'`` -> seconds between requests (the emission interval)."""
+    count, period = rate.split('/')
+    return DURATIONS[period[0]] / int(count)
+
+
+class LocalBucketBackend:
+    """Buckets in process memory: exact, but each process allows the full rate."""
+    max_keys = 100000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tats = OrderedDict()
+
+    def consume(self, key, interval, burst):
+        """Take a token from ``key``'s bucket. Returns 0 if allowed, else the seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            tat = max(self._tats.get(key, now), now)
+            wait = tat - now - interval * (burst - 1)
+            if wait > 0:
+                return wait
+            self._tats[key] = tat + interval
+            self._tats.move_to_end(key)
+            if len(self._tats) > self.max_keys:
+                self._tats.popitem(last=False)  # Forgetting a client only refills its bucket
+            return 0
+
+
+class CacheBucketBackend:
+    """
+    Buckets in the ``THROTTLING['CACHE_ALIAS']`` cache, shared by all processes.
+    The read-modify-write is not atomic, so concurrent requests of one client
+    can slightly exceed the burst.
+    """
+    key_prefix = 'throttle'
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLING['CACHE_ALIAS']]
+
+    def consume(self, key, interval, burst):
+        now = time.time()
+        cache_key = f'{self.key_prefix}:{key}'
+        tat = max(self.cache.get(cache_key, now), now)
+        wait = tat - now - interval * (burst - 1)
+        if wait > 0:
+            return wait
+        self.cache.set(cache_key, tat + interval, timeout=math.ceil(tat + interval - now))
+        return 0
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = import_string(settings.THROTTLING['BACKEND'])()
+        return _backend
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttles each client per ``throttle_scope`` of the view, at the scope's THROTTLING rate."""
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None) or 'default'
+        limit = settings.THROTTLING['RATES'].get(scope)
+        if limit is None:
+            return True
+
+        rate, burst = limit
+        user = request.user
+        client = f'user:{user.pk}' if user and user.is_authenticated else f'ip:{self.get_ident(request)}'
+        self.retry_after = get_backend().consume(f'{scope}:{client}', parse_rate(rate), burst)
+        return self.retry_after == 0
+
+    def wait(self):
+        return self.retry_after
+
+
+class LoadSheddingMiddleware:
+    """
+    Refuses requests with 503 while this process is overloaded: too many requests
+    in flight, or an exponentially weighted moving average of response times
+    above the threshold. Over the latency threshold a growing share of requests
+    is refused, up to ``MAX_SHED_RATIO``, so the average keeps being measured and
+    can recover.
+    """
+    sync_capable = True
+    async_capable = True
+    smoothing = 0.1  # Weight of the latest response time in the moving average
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.latency = 0.0  # Seconds
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if request.path.startswith(settings.LOAD_SHEDDING['EXEMPT_PATHS']):
+            return self.get_response(request)
+        rejected = self.admit()
+        if rejected is not None:
+            return rejected
+        started = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            self.release(started)
+
+    async def __acall__(self, request):
+        if request.path.startswith(settings.LOAD_SHEDDING['EXEMPT_PATHS']):
+            return await self.get_response(request)
+        rejected = self.admit()
+        if rejected is not None:
+            return rejected
+        started = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.release(started)
+
+    def admit(self):
+        """None if the request may proceed (and is now in flight), else the 503 response."""
+        options = settings.LOAD_SHEDDING
+        threshold = options['LATENCY_THRESHOLD_MS'] / 1000
+        with self._lock:
+            if options['MAX_IN_FLIGHT'] and self.in_flight >= options['MAX_IN_FLIGHT']:
+                return self.shed("The server is handling too many requests.")
+            if threshold and self.latency > threshold:
+                ratio = min(self.latency / threshold - 1, options['MAX_SHED_RATIO'])
+                if random.random() < ratio:
+                    return self.shed("The server is responding slowly.")
+            self.in_flight += 1
+        return None
+
+    def release(self, started):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.in_flight -= 1
+            self.latency += self.smoothing * (elapsed - self.latency)
+
+    def shed(self, message):
+        response = JsonResponse({"error": f"{message} Please retry shortly."}, status=503)
+        response['Retry-After'] = str(settings.LOAD_SHEDDING['RETRY_AFTER'])
+        return response
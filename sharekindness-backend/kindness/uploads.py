@@ -0,0 +1,85 @@
+"""
+File handling for resumable uploads.
+
+A client creates an ``Upload`` with the file's size and SHA-256, then sends the
+bytes in any number of chunks, each tagged with the offset it starts at. Chunks
+are streamed to ``<TEMP_DIR>/<id>.part`` in small blocks, so memory use does
+not depend on chunk or file size. If a connection drops, the client asks for
+the current offset and resumes from there. Once the last byte arrives the
+checksum is verified and the upload can be attached to a donation.
+"""
+import hashlib
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.http import UnreadablePostError
+from django.utils import timezone
+from PIL import Image
+
+from .models import Upload
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = 64 * 1024
+
+
+def create_part_file(upload):
+    os.makedirs(settings.UPLOADS['TEMP_DIR'], exist_ok=True)
+    open(upload.path, 'wb').close()
+
+
+def append_chunk(upload, stream, length):
+    """
+    Write up to ``length`` bytes from ``stream`` at ``upload.received`` and return
+    how many were stored. A dropped connection keeps the bytes received so far.
+    """
+    written = 0
+    with open(upload.path, 'r+b') as part:
+        part.seek(upload.received)
+        part.truncate()  # Drop anything past the acknowledged offset
+        try:
+            while written < length:
+                block = stream.read(min(BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                part.write(block)
+                written += len(block)
+        except (OSError, UnreadablePostError):
+            logger.warning("Upload %s interrupted after %s bytes of this chunk", upload.pk, written)
+    return written
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for block in iter(lambda: part.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_image(path):
+    try:
+        with Image.open(path) as image:
+            image.verify()
+        return True
+    except Exception:
+        return False
+
+
+def discard(*uploads):
+    """Delete ``uploads`` and their part files, with one query."""
+    for upload in uploads:
+        if os.path.exists(upload.path):
+            os.remove(upload.path)
+    Upload.objects.filter(pk__in=[upload.pk for upload in uploads]).delete()
+
+
+def purge_expired_uploads():
+    """Delete unfinished or unused uploads older than ``UPLOADS['EXPIRY_HOURS']``."""
+    cutoff = timezone.now() - timedelta(hours=settings.UPLOADS['EXPIRY_HOURS'])
+    expired = list(Upload.objects.filter(created_at__lt=cutoff))
+    for upload in expired:
+        discard(upload)
+    return len(expired)
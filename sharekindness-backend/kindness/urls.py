@@ -8,22 +8,28 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from rest_framework_simplejwt.views import TokenRefreshView
 
 # Import your newly modularized views
 # Adjust import paths based on your actual project structure
-from kindness.views.auth import RegisterView, LoginView, LogoutView, ChangePasswordView
-from kindness.views.donations import DonationListCreateView, DonationDetailView
+from kindness.views.auth import RegisterView, LoginView, LogoutView, ChangePasswordView, TokenObtainView
+from kindness.views.donations import (
+    AsyncDonationDetailView, AsyncDonationListView, BulkDonationCreateView, DonationDetailView, DonationListCreateView,
+)
 from kindness.views.requests import RequestListCreateView, RequestDetailView
-from kindness.views.base import LogView
-from kindness.views.user import UserDashboardView, UserNotificationView, UserProfileView
+from kindness.views.base import LogBatchView, LogView, read_view
+from kindness.views.events import EventStreamView
+from kindness.views.metrics import MetricsView
+from kindness.views.uploads import UploadCreateView, UploadDetailView
+from kindness.views.user import (
+    AsyncUserDashboardView, AsyncUserNotificationView, AsyncUserProfileView,
+    UserDashboardView, UserNotificationView, UserProfileView,
+)
 from kindness.views.requests import RequestListCreateView, RequestDetailView, MarkAsClaimedView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 
     # Auth endpoints
     path('api/register/', RegisterView.as_view(), name='register'),
@@ -32,8 +38,13 @@ urlpatterns = [
     path('api/user/change-password/', ChangePasswordView.as_view(), name='change-password'),  # New
 
     # Donation endpoints
-    path('api/donations/', DonationListCreateView.as_view(), name='donation-list-create'),
-    path('api/donations/<int:pk>/', DonationDetailView.as_view(), name='donation-detail'),
+    path('api/donations/', read_view(DonationListCreateView, AsyncDonationListView), name='donation-list-create'),
+    path('api/donations/<int:pk>/', read_view(DonationDetailView, AsyncDonationDetailView), name='donation-detail'),
+    path('api/donations/bulk/', BulkDonationCreateView.as_view(), name='donation-bulk-create'),
+
+    # Resumable upload endpoints
+    path('api/uploads/', UploadCreateView.as_view(), name='upload-create'),
+    path('api/uploads/<uuid:pk>/', UploadDetailView.as_view(), name='upload-detail'),
 
     # Request endpoints
     path('api/requests/', RequestListCreateView.as_view(), name='request-list-create'),
@@ -42,14 +53,18 @@ urlpatterns = [
 
     # Log endpoint
     path('api/log/', LogView.as_view(), name='log'),
+    path('api/log/batch/', LogBatchView.as_view(), name='log-batch'),
 
     # User endpoints
-    path('api/user-dashboard/', UserDashboardView.as_view(), name='user-dashboard'),
-    path('api/user-notifications/', UserNotificationView.as_view(), name='user-notifications'),
-    path('api/user/profile/', UserProfileView.as_view(), name='user-profile'),  # New
+    path('api/user-dashboard/', read_view(UserDashboardView, AsyncUserDashboardView), name='user-dashboard'),
+    path('api/user-notifications/', read_view(UserNotificationView, AsyncUserNotificationView), name='user-notifications'),
+    path('api/user/profile/', read_view(UserProfileView, AsyncUserProfileView), name='user-profile'),  # New
+
+    # Event stream (server-sent events, ASGI only)
+    path('api/events/', EventStreamView.as_view(), name='event-stream'),
 
     # JWT token endpoints
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/', TokenObtainView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
 
@@ -1,13 +1,16 @@
 import logging
 from django.contrib.auth import authenticate, get_user_model
 from django.contrib.auth.hashers import check_password, make_password
+from django.db import transaction
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.tokens import TokenError
+from rest_framework_simplejwt.views import TokenObtainPairView
 
 from .base import handle_error
+from ..authentication import VersionedRefreshToken, issue_tokens, lock_current_user
 from ..serializers import RegisterSerializer, UserSerializer
 
 logger = logging.getLogger(__name__)
@@ -16,6 +19,7 @@ User = get_user_model()
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
+    throttle_scope = "register"
 
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
@@ -36,6 +40,7 @@ class RegisterView(APIView):
 
 class LoginView(APIView):
     permission_classes = [AllowAny]
+    throttle_scope = "login"
 
     def post(self, request):
         email = request.data.get("email")
@@ -46,18 +51,18 @@ class LoginView(APIView):
 
         user = authenticate(request, username=email, password=password)
         if user:
-            refresh = RefreshToken.for_user(user)
             return Response(
-                {
-                    "message": "Login successful!",
-                    "access": str(refresh.access_token),
-                    "refresh": str(refresh),
-                },
+                {"message": "Login successful!", **issue_tokens(user)},
                 status=status.HTTP_200_OK,
             )
         return handle_error("Invalid email or password.", status.HTTP_401_UNAUTHORIZED)
 
 
+class TokenObtainView(TokenObtainPairView):
+    """simplejwt's token endpoint, sharing the login throttle."""
+    throttle_scope = "login"
+
+
 class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -67,9 +72,9 @@ class LogoutView(APIView):
             return handle_error("Refresh token is required for logout.", status.HTTP_400_BAD_REQUEST)
 
         try:
-            token = RefreshToken(refresh_token)
+            token = VersionedRefreshToken(refresh_token)
             token.blacklist()
-            logger.info(f"Token successfully blacklisted for user {request.user.id}")
+            logger.info("Token successfully blacklisted for user %s", request.user.id)
             return Response({"message": "Logout successful."}, status=status.HTTP_200_OK)
         except TokenError:
             return handle_error("Invalid or expired refresh token.", status.HTTP_400_BAD_REQUEST)
@@ -80,9 +85,9 @@ class ChangePasswordView(APIView):
     Handle password change for authenticated users.
     """
     permission_classes = [IsAuthenticated]
+    throttle_scope = "password"
 
     def post(self, request):
-        user = request.user
         old_password = request.data.get("old_password")
         new_password = request.data.get("new_password")
         confirm_password = request.data.get("confirm_password")
@@ -90,14 +95,28 @@ class ChangePasswordView(APIView):
         if not old_password or not new_password or not confirm_password:
             return handle_error("All fields are required.", status.HTTP_400_BAD_REQUEST)
 
-        if not check_password(old_password, user.password):
-            return handle_error("Old password is incorrect.", status.HTTP_400_BAD_REQUEST)
-
         if new_password != confirm_password:
             return handle_error("New password and confirm password do not match.", status.HTTP_400_BAD_REQUEST)
 
-        # Update the user's password
-        user.password = make_password(new_password)
-        user.save()
-        logger.info(f"Password changed successfully for user {user.id}")
-        return Response({"message": "Password changed successfully!"}, status=status.HTTP_200_OK)
+        # Hash outside the row lock: each PBKDF2 run takes hundreds of milliseconds. Check against
+        # the stored password, not the cached request.user's, which may be stale.
+        stored_password = User.objects.filter(pk=request.user.pk).values_list("password", flat=True).first()
+        if stored_password is None or not check_password(old_password, stored_password):
+            return handle_error("Old password is incorrect.", status.HTTP_400_BAD_REQUEST)
+        new_password_hash = make_password(new_password)
+
+        with transaction.atomic():
+            user = lock_current_user(request)
+            if user.password != stored_password:  # Changed since it was checked
+                return handle_error("Old password is incorrect.", status.HTTP_400_BAD_REQUEST)
+
+            # Update the user's password; the new token version revokes every token issued before
+            user.password = new_password_hash
+            user.token_version += 1
+            user.save()
+        logger.info("Password changed successfully for user %s", user.id)
+        # Fresh tokens keep this session signed in
+        return Response(
+            {"message": "Password changed successfully!", **issue_tokens(user)},
+            status=status.HTTP_200_OK,
+        )
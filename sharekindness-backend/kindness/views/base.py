@@ -1,26 +1,113 @@
+import asyncio
+import hashlib
 import logging
+from asgiref.sync import sync_to_async
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from ..clientlogs import ingest
+from ..logs import rate_limited
+from ..pagination import KeysetPagination
+from ..serializers import ClientLogEventSerializer
 
 logger = logging.getLogger(__name__)
 
 
 def handle_error(message, status_code):
-    """Helper function to create error responses and log messages."""
-    logger.error(message)
+    """
+    Helper function to create error responses and log messages. Server errors
+    are logged as errors and client errors as warnings, each distinct message
+    at most ``LOG_RATE_LIMIT['PER_INTERVAL']`` times per interval.
+    """
+    if status_code >= 400:
+        level = logging.ERROR if status_code >= 500 else logging.WARNING
+        rate_limited(logger, level, (status_code, str(message)), "%s: %s", status_code, message)
     return Response({"error": message}, status=status_code)
 
 
+# Request headers that make a request conditional (RFC 9110, section 13)
+PRECONDITION_HEADERS = ("HTTP_IF_MATCH", "HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE", "HTTP_IF_UNMODIFIED_SINCE")
+
+
+def has_preconditions(request):
+    return any(header in request.META for header in PRECONDITION_HEADERS)
+
+
+def validator_row(obj, fields):
+    """``(pk, *values)`` for ``fields`` such as ``"user__updated_at"``, read from loaded objects."""
+    values = []
+    for field in fields:
+        value = obj
+        for name in field.split("__"):
+            value = getattr(value, name)
+        values.append(value)
+    return (obj.pk, *values)
+
+
+def make_validators(request, rows):
+    """
+    ``(etag, last_modified)`` of a representation of ``rows``, each a primary key
+    followed by the ``updated_at`` values its rendering depends on.
+    """
+    rows = [tuple(row) for row in rows]
+    digest = hashlib.sha1(repr((request.accepted_media_type, rows)).encode()).hexdigest()
+    timestamps = [value for row in rows for value in row[1:] if value is not None]
+    return quote_etag(digest), max(timestamps, default=None)
+
+
+def evaluate_preconditions(request, etag, last_modified=None):
+    """A 304 or 412 response if the request's conditional headers call for one, else None."""
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified and int(last_modified.timestamp())
+    )
+    if response is None:
+        return None
+    if response.status_code == status.HTTP_412_PRECONDITION_FAILED:
+        return handle_error("The resource has changed since it was fetched.", status.HTTP_412_PRECONDITION_FAILED)
+    return set_validators(response, etag, last_modified)
+
+
+def set_validators(response, etag, last_modified=None):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    # Revalidate on every use instead of heuristically reusing a stale copy.
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
 class BaseListCreateView(APIView):
     model = None
     serializer_class = None
+    pagination_class = KeysetPagination
+    # updated_at columns each row's representation depends on; they make up the ETag
+    validator_fields = ("updated_at",)
+
+    def get_queryset(self, request):
+        """Override to narrow down the objects returned by the list endpoint."""
+        return self.model.objects.all()
 
     def get(self, request):
-        objects = self.model.objects.all()
-        serializer = self.serializer_class(objects, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        paginator = self.pagination_class()
+        page_queryset = paginator.get_page_queryset(self.get_queryset(request), request, view=self)
+        if has_preconditions(request):
+            # Compare against the page's validators without loading related objects.
+            rows = page_queryset.prefetch_related(None).values_list("pk", *self.validator_fields)
+            not_modified = evaluate_preconditions(request, make_validators(request, rows)[0])
+            if not_modified is not None:
+                return not_modified
+
+        objects = list(page_queryset)
+        etag, _ = make_validators(request, [validator_row(obj, self.validator_fields) for obj in objects])
+        serializer = self.serializer_class(paginator.get_page(objects), many=True)
+        return set_validators(paginator.get_paginated_response(serializer.data), etag)
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
@@ -37,19 +124,50 @@ class BaseListCreateView(APIView):
 class BaseDetailView(APIView):
     model = None
     serializer_class = None
+    # updated_at columns the representation depends on; they make up ETag and Last-Modified
+    validator_fields = ("updated_at",)
+
+    def get_queryset(self, request):
+        """Override to preload related objects for the detail endpoint."""
+        return self.model.objects.all()
+
+    def get_serializer_context(self, request):
+        """Override to pass the request, or anything else, to the serializer on updates."""
+        return {}
+
+    def get_validators(self, request, pk):
+        """Validators of object ``pk`` from its updated_at columns alone."""
+        row = self.model.objects.filter(pk=pk).values_list("pk", *self.validator_fields).first()
+        if row is None:
+            raise Http404
+        return make_validators(request, [row])
 
     def get(self, request, pk):
-        obj = get_object_or_404(self.model, pk=pk)
+        if has_preconditions(request):
+            not_modified = evaluate_preconditions(request, *self.get_validators(request, pk))
+            if not_modified is not None:
+                return not_modified
+        obj = get_object_or_404(self.get_queryset(request), pk=pk)
         serializer = self.serializer_class(obj)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        return set_validators(response, *make_validators(request, [validator_row(obj, self.validator_fields)]))
 
     def put(self, request, pk):
-        obj = get_object_or_404(self.model, pk=pk)
-        serializer = self.serializer_class(obj, data=request.data, partial=True)
-        if serializer.is_valid():
+        with transaction.atomic():
+            obj = get_object_or_404(self.model.objects.select_for_update(), pk=pk)
+            # If-Match: refuse to overwrite changes the client has not seen.
+            if has_preconditions(request):
+                precondition_failed = evaluate_preconditions(request, *self.get_validators(request, pk))
+                if precondition_failed is not None:
+                    return precondition_failed
+            serializer = self.serializer_class(
+                obj, data=request.data, partial=True, context=self.get_serializer_context(request)
+            )
+            if not serializer.is_valid():
+                return handle_error(serializer.errors, status.HTTP_400_BAD_REQUEST)
             serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return handle_error(serializer.errors, status.HTTP_400_BAD_REQUEST)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        return set_validators(response, *self.get_validators(request, pk))
 
     def delete(self, request, pk):
         obj = get_object_or_404(self.model, pk=pk)
@@ -60,21 +178,175 @@ class BaseDetailView(APIView):
         )
 
 
+class AsyncAPIView(APIView):
+    """
+    APIView with coroutine handlers, for read endpoints served over ASGI.
+
+    Authentication, permission and throttle checks may query the database, so
+    they run through sync_to_async; handlers fetch with the async ORM and must
+    preload everything their serializers read.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):  # OPTIONS is answered synchronously
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncListView(AsyncAPIView):
+    """Read-only, async counterpart of BaseListCreateView."""
+    model = None
+    serializer_class = None
+    pagination_class = KeysetPagination
+    validator_fields = ("updated_at",)
+
+    def get_queryset(self, request):
+        return self.model.objects.all()
+
+    async def get(self, request):
+        paginator = self.pagination_class()
+        page_queryset = paginator.get_page_queryset(self.get_queryset(request), request, view=self)
+        if has_preconditions(request):
+            rows = page_queryset.prefetch_related(None).values_list("pk", *self.validator_fields)
+            rows = [row async for row in rows]
+            not_modified = evaluate_preconditions(request, make_validators(request, rows)[0])
+            if not_modified is not None:
+                return not_modified
+
+        objects = [obj async for obj in page_queryset]
+        etag, _ = make_validators(request, [validator_row(obj, self.validator_fields) for obj in objects])
+        serializer = self.serializer_class(paginator.get_page(objects), many=True)
+        return set_validators(paginator.get_paginated_response(serializer.data), etag)
+
+
+class AsyncDetailView(AsyncAPIView):
+    """Read-only, async counterpart of BaseDetailView."""
+    model = None
+    serializer_class = None
+    validator_fields = ("updated_at",)
+
+    def get_queryset(self, request):
+        return self.model.objects.all()
+
+    async def get(self, request, pk):
+        if has_preconditions(request):
+            row = await self.model.objects.filter(pk=pk).values_list("pk", *self.validator_fields).afirst()
+            if row is None:
+                raise Http404
+            not_modified = evaluate_preconditions(request, *make_validators(request, [row]))
+            if not_modified is not None:
+                return not_modified
+        try:
+            obj = await self.get_queryset(request).aget(pk=pk)
+        except self.model.DoesNotExist:
+            raise Http404
+        serializer = self.serializer_class(obj)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        return set_validators(response, *make_validators(request, [validator_row(obj, self.validator_fields)]))
+
+
+def read_view(view_class, async_view_class):
+    """
+    The view for a URL whose reads have an async implementation.
+
+    With ``settings.ASYNC_READ_VIEWS`` (for deployments on kindness.asgi), GET and
+    HEAD go to ``async_view_class`` and other methods to ``view_class``, run in a
+    thread as Django does for any sync view under ASGI. Otherwise ``view_class``
+    serves everything, so WSGI deployments never pay for an event loop.
+    """
+    sync_view = view_class.as_view()
+    if not settings.ASYNC_READ_VIEWS:
+        return sync_view
+    async_view = async_view_class.as_view()
+
+    async def view(request, *args, **kwargs):
+        if request.method in ("GET", "HEAD"):
+            return await async_view(request, *args, **kwargs)
+        return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    view.view_class = view_class
+    return view
+
+
 class LogView(APIView):
     """
-    Example log view for demonstration.
+    Log one client message. The event goes through the sampled, queued client
+    log (see kindness.clientlogs); LogBatchView takes many events per request.
     """
     permission_classes = []  # You could set to [AllowAny] or otherwise
+    throttle_scope = "logs"
 
     def post(self, request):
         message = request.data.get("message")
         level = request.data.get("level", "info").lower()
+        if level not in ("info", "error", "debug"):
+            level = "info"
 
-        log_function = {
-            "info": logger.info,
-            "error": logger.error,
-            "debug": logger.debug,
-        }.get(level, logger.info)
-
-        log_function(message)
+        ingest([{"level": level, "message": str(message)}], request.user.pk)
         return Response({"status": "logged"}, status=status.HTTP_200_OK)
+
+
+class LogBatchView(APIView):
+    """
+    Log a batch of structured client events, sent as ``{"events": [...]}`` or as
+    the list itself. Each event has ``message`` and optionally ``level``
+    (default info), ``source``, ``timestamp`` and ``context`` (an object).
+    Invalid events are reported by index without affecting the others; valid
+    ones are sampled by level and queued for the background log writer.
+    """
+    permission_classes = []
+    throttle_scope = "logs"
+
+    def post(self, request):
+        options = settings.CLIENT_LOGS
+        # Refuse oversized batches before the body is read and parsed.
+        try:
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        if length > options["MAX_BODY_BYTES"]:
+            return handle_error(
+                f"Log batches are limited to {options['MAX_BODY_BYTES']} bytes.",
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        events = request.data
+        if isinstance(events, dict):
+            events = events.get("events")
+        if not isinstance(events, list):
+            return handle_error("Expected a list of log events.", status.HTTP_400_BAD_REQUEST)
+        if not 0 < len(events) <= options["MAX_EVENTS"]:
+            return handle_error(
+                f"Send between 1 and {options['MAX_EVENTS']} events per request.", status.HTTP_400_BAD_REQUEST
+            )
+
+        valid, errors = [], []
+        for index, event in enumerate(events):
+            serializer = ClientLogEventSerializer(data=event)
+            if serializer.is_valid():
+                valid.append(serializer.validated_data)
+            else:
+                errors.append({"index": index, "errors": serializer.errors})
+
+        logged = ingest(valid, request.user.pk)
+        return Response(
+            {"received": len(events), "logged": logged, "errors": errors}, status=status.HTTP_202_ACCEPTED
+        )
@@ -1,22 +1,60 @@
+import json
 import logging
+import uuid
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from ..models import Donation
-from ..serializers import DonationSerializer
-from .base import BaseListCreateView, BaseDetailView, handle_error
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from ..cache import dashboard_cache
+from ..images import schedule_derivatives
+from ..models import Donation, Upload
+from ..serializers import DonationFilterSerializer, DonationSerializer
+from ..storage import save_files
+from ..uploads import discard
+from .base import AsyncDetailView, AsyncListView, BaseListCreateView, BaseDetailView, handle_error
 
 logger = logging.getLogger(__name__)
 
 
-class DonationListCreateView(BaseListCreateView):
+class DonationFilterMixin:
+    """Query parameter filtering shared by the sync and async donation lists."""
+
+    def apply_filters(self, request):
+        """Validate the filters; returns an error response if they are invalid."""
+        self.filters = DonationFilterSerializer(data=request.query_params)
+        if not self.filters.is_valid():
+            return handle_error(self.filters.errors, status.HTTP_400_BAD_REQUEST)
+        if self.filters.search_query:
+            self.ordering = ('-rank', '-id')
+        return None
+
+    def get_queryset(self, request):
+        return self.filters.filter_queryset(Donation.objects.with_related())
+
+
+class DonationListCreateView(DonationFilterMixin, BaseListCreateView):
     permission_classes = [IsAuthenticated]
     model = Donation
     serializer_class = DonationSerializer
+    # Queries per request, authentication included (see kindness.querycheck)
+    query_budget = {"GET": 3}
+
+    def get(self, request):
+        """
+        List donations, optionally filtered by category, status, donor city/state
+        and a created_at range (created_after/created_before). With ``q`` the
+        results are full-text matches ordered by relevance.
+        """
+        return self.apply_filters(request) or super().get(request)
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data, context={"request": request})
         if serializer.is_valid():
             donation = serializer.save(donor=request.user)
-            logger.info(f"Donation created successfully: ID={donation.id}, Name={donation.item_name}")
+            logger.info("Donation created successfully: ID=%s, Name=%s", donation.id, donation.item_name)
             return handle_error(serializer.data, 201)
         return handle_error(serializer.errors, 400)
 
@@ -25,3 +63,132 @@ class DonationDetailView(BaseDetailView):
     permission_classes = [IsAuthenticated]
     model = Donation
     serializer_class = DonationSerializer
+    query_budget = {"GET": 3}
+
+    def get_queryset(self, request):
+        return Donation.objects.with_related()
+
+    def get_serializer_context(self, request):
+        # DonationSerializer resolves upload_id against the requesting user's uploads
+        return {"request": request}
+
+
+class AsyncDonationListView(DonationFilterMixin, AsyncListView):
+    permission_classes = [IsAuthenticated]
+    model = Donation
+    serializer_class = DonationSerializer
+
+    async def get(self, request):
+        """Async variant of DonationListCreateView.get."""
+        return self.apply_filters(request) or await super().get(request)
+
+
+class AsyncDonationDetailView(AsyncDetailView):
+    permission_classes = [IsAuthenticated]
+    model = Donation
+    serializer_class = DonationSerializer
+
+    def get_queryset(self, request):
+        return Donation.objects.with_related()
+
+
+class BulkDonationCreateView(APIView):
+    """
+    Create many donations in one call.
+
+    Send either a JSON list of donations (images referenced by ``upload_id``) or
+    a multipart form whose ``donations`` field holds that JSON list, with the
+    image of item ``i`` in the file field ``image_<i>``. Valid items are inserted
+    with a single bulk INSERT; invalid items are reported by index without
+    affecting the others.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_items(self, request):
+        data = request.data
+        if hasattr(data, "getlist"):  # Multipart form
+            try:
+                data = json.loads(data.get("donations", ""))
+            except ValueError:
+                return None
+        elif isinstance(data, dict):
+            data = data.get("donations")
+        return data if isinstance(data, list) else None
+
+    def get_uploads(self, request, items):
+        """The requesting user's completed uploads referenced by ``items``, by ID, in one query."""
+        upload_ids = set()
+        for item in items:
+            try:
+                upload_ids.add(uuid.UUID(str(item["upload_id"])))
+            except (TypeError, KeyError, ValueError):
+                continue  # No or malformed upload_id; the serializer reports it
+        if not upload_ids:
+            return {}
+        return {
+            upload.pk: upload
+            for upload in Upload.objects.filter(pk__in=upload_ids, user=request.user, status="COMPLETE")
+        }
+
+    def post(self, request):
+        items = self.get_items(request)
+        if items is None:
+            return handle_error("Expected a list of donations.", status.HTTP_400_BAD_REQUEST)
+        if not 0 < len(items) <= settings.BULK_DONATION_MAX_ITEMS:
+            return handle_error(
+                f"Send between 1 and {settings.BULK_DONATION_MAX_ITEMS} donations per request.",
+                status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = [None] * len(items)
+        valid = []
+        context = {"request": request, "uploads": self.get_uploads(request, items)}
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index] = {"index": index, "status": "error", "errors": "Expected an object."}
+                continue
+            image = request.FILES.get(f"image_{index}")
+            if image is not None:
+                item = {**item, "image": image}
+            serializer = DonationSerializer(data=item, context=context)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {"index": index, "status": "error", "errors": serializer.errors}
+
+        if valid:
+            uploads = {}
+            with ExitStack() as files, transaction.atomic():
+                donations = []
+                for _, data in valid:
+                    upload = DonationSerializer.attach_upload(data, files)
+                    if upload is not None:
+                        uploads[upload.pk] = upload
+                    donations.append(Donation(donor=request.user, **data))
+                # Store every image in one batch rather than one at a time from the field's pre_save.
+                new_images = [donation for donation in donations if donation.image and not donation.image._committed]
+                field = Donation._meta.get_field("image")
+                names = save_files(field.storage, [
+                    (field.generate_filename(donation, donation.image.name), donation.image.file)
+                    for donation in new_images
+                ])
+                for donation, name in zip(new_images, names):
+                    donation.image = name
+                Donation.objects.bulk_create(donations)
+
+            if uploads:
+                discard(*uploads.values())
+            # bulk_create sends no post_save, so do what the receivers would.
+            for (index, _), donation in zip(valid, donations):
+                schedule_derivatives(donation, "image", "image_variants")
+                results[index] = {"index": index, "status": "created", "id": donation.pk}
+            dashboard_cache.invalidate([request.user.pk])
+            logger.info("Bulk created %s donations for user %s", len(donations), request.user.pk)
+
+        if len(valid) == len(items):
+            status_code = status.HTTP_201_CREATED
+        elif valid:
+            status_code = status.HTTP_207_MULTI_STATUS
+        else:
+            status_code = status.HTTP_400_BAD_REQUEST
+        return Response({"created": len(valid), "results": results}, status=status_code)
@@ -0,0 +1,71 @@
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from ..authentication import CachedJWTAuthentication
+from ..events import get_broker
+
+logger = logging.getLogger(__name__)
+
+
+class EventStreamView(View):
+    """
+    Server-sent events stream of request notifications for the authenticated user:
+    ``request.created`` and ``request.claimed`` for donors, ``request.approved``
+    and ``request.rejected`` for recipients.
+
+    EventSource cannot set headers, so the access token may also be passed as
+    ``?token=``. The stream needs the ASGI entry point, where an idle connection
+    is a suspended coroutine instead of a blocked worker thread.
+    """
+    authentication = CachedJWTAuthentication()
+
+    async def get(self, request):
+        if not hasattr(request, "scope"):
+            return JsonResponse(
+                {"error": "The event stream is only available when served over ASGI."}, status=501
+            )
+
+        user = await sync_to_async(self.authenticate)(request)
+        if user is None:
+            return JsonResponse({"error": "Invalid or missing access token."}, status=401)
+
+        response = StreamingHttpResponse(self.stream(user.pk), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # Stop nginx from buffering the stream
+        return response
+
+    def authenticate(self, request):
+        raw_token = request.GET.get("token")
+        if raw_token is None:
+            header = self.authentication.get_header(request)
+            raw_token = header and self.authentication.get_raw_token(header)
+        if not raw_token:
+            return None
+        try:
+            return self.authentication.get_user(self.authentication.get_validated_token(raw_token))
+        except (InvalidToken, AuthenticationFailed):
+            return None
+
+    async def stream(self, user_id):
+        options = settings.EVENT_STREAM
+        subscription = get_broker().subscribe(user_id)
+        # Ending streams periodically bounds the cost of clients that vanished
+        # without the server noticing; EventSource reconnects on its own.
+        deadline = time.monotonic() + options["MAX_CONNECTION_AGE"]
+        try:
+            yield f"retry: {options['RETRY_MS']}\n\n"
+            while (remaining := deadline - time.monotonic()) > 0:
+                event = await subscription.get(min(options["KEEPALIVE_INTERVAL"], remaining))
+                if event is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            subscription.close()
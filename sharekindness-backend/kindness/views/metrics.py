@@ -0,0 +1,35 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+
+from ..cache import dashboard_cache
+from ..metrics import Counter, get_metrics, render
+
+
+class MetricsView(View):
+    """
+    Prometheus scrape endpoint for this process's request metrics and dashboard
+    cache statistics. It requires ``Authorization: Bearer <METRICS['TOKEN']>``;
+    without a configured token it is only served with DEBUG.
+    """
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def get(self, request):
+        token = settings.METRICS["TOKEN"]
+        if token is None and not settings.DEBUG:
+            return JsonResponse({"error": "Metrics are disabled without METRICS_TOKEN."}, status=404)
+        if token is not None and not hmac.compare_digest(
+            request.META.get("HTTP_AUTHORIZATION", ""), f"Bearer {token}"
+        ):
+            return JsonResponse({"error": "Invalid or missing metrics token."}, status=401)
+        return HttpResponse(get_metrics().render() + self.cache_metrics(), content_type=self.content_type)
+
+    def cache_metrics(self):
+        counters = []
+        for name, value in dashboard_cache.stats.snapshot().items():
+            counter = Counter(f"dashboard_cache_{name}_total", f"Dashboard cache {name}.", ())
+            counter.inc((), value)
+            counters.append(counter)
+        return render(counters)
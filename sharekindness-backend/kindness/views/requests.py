@@ -2,6 +2,8 @@ import logging
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 
@@ -16,6 +18,12 @@ class RequestListCreateView(BaseListCreateView):
     permission_classes = [IsAuthenticated]
     model = Request
     serializer_class = RequestSerializer
+    query_budget = {"GET": 3}
+    # A request renders its user and its donation
+    validator_fields = ("updated_at", "user__updated_at", "donation__updated_at")
+
+    def get_queryset(self, request):
+        return Request.objects.with_related()
 
     def post(self, request):
         donation_id = request.data.get("donation")
@@ -31,38 +39,64 @@ class RequestListCreateView(BaseListCreateView):
         if donation.status != 'AVAILABLE':
             return handle_error("This donation is not available for requests.", status.HTTP_400_BAD_REQUEST)
 
-        # Prevent duplicate requests by the same user
+        # Prevent duplicate requests by the same user (fast path; the unique constraint is the guarantee)
         if Request.objects.filter(user=request.user, donation=donation).exists():
             return handle_error("You have already requested this donation.", status.HTTP_400_BAD_REQUEST)
 
-        # Ensure the maximum number of requests has not been reached
-        if donation.requests.count() >= 5:
-            donation.status = 'CLOSED'
-            donation.save()
-            return handle_error("This donation is no longer accepting requests.", status.HTTP_400_BAD_REQUEST)
-
         # Validate requested quantity
         try:
             requested_quantity = int(requested_quantity)
             if requested_quantity <= 0:
                 return handle_error("Requested quantity must be greater than zero.", status.HTTP_400_BAD_REQUEST)
-        except ValueError:
+        except (TypeError, ValueError):
             return handle_error("Invalid requested quantity format.", status.HTTP_400_BAD_REQUEST)
 
-        # Save the request (do not subtract from the donation quantity yet)
         serializer = self.serializer_class(data=request.data)
-        if serializer.is_valid():
-            request_obj = serializer.save(user=request.user, donation=donation)
-            logger.info(f"Request created successfully for donation ID={donation_id}")
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        if not serializer.is_valid():
+            return handle_error(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+        # Admit and insert in one transaction. The conditional UPDATE takes a slot
+        # under the cap and row-locks the donation, so concurrent admissions queue
+        # behind it; a duplicate insert rolls the slot back.
+        try:
+            with transaction.atomic():
+                admitted = Donation.objects.filter(
+                    pk=donation.pk, status="AVAILABLE", admitted_requests__lt=Donation.MAX_REQUESTS
+                ).update(admitted_requests=F("admitted_requests") + 1)
+                if admitted:
+                    # Save the request (do not subtract from the donation quantity yet)
+                    serializer.save(user=request.user, donation=donation)
+        except IntegrityError:
+            return handle_error("You have already requested this donation.", status.HTTP_400_BAD_REQUEST)
 
-        return handle_error(serializer.errors, status.HTTP_400_BAD_REQUEST)
+        if not admitted:
+            return self.refuse(donation)
+
+        logger.info("Request created successfully for donation ID=%s", donation_id)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def refuse(self, donation):
+        """Explain why the conditional admission matched no row."""
+        donation.refresh_from_db(fields=["status", "admitted_requests"])
+        if donation.status != "AVAILABLE":
+            return handle_error("This donation is not available for requests.", status.HTTP_400_BAD_REQUEST)
+
+        # The maximum number of requests has been reached
+        donation.status = "CLOSED"
+        donation.save(update_fields=["status", "updated_at"])
+        return handle_error("This donation is no longer accepting requests.", status.HTTP_400_BAD_REQUEST)
 
 
 class RequestDetailView(BaseDetailView):
     permission_classes = [IsAuthenticated]
     model = Request
     serializer_class = RequestSerializer
+    query_budget = {"GET": 3}
+    # A request renders its user and its donation
+    validator_fields = ("updated_at", "user__updated_at", "donation__updated_at")
+
+    def get_queryset(self, request):
+        return Request.objects.with_related()
 
 
 class MarkAsClaimedView(APIView):
@@ -77,24 +111,29 @@ class MarkAsClaimedView(APIView):
 
         # Ensure only the recipient can claim their approved item
         if request.user != request_obj.user:
-            return handle_error("You can only claim your own approved requests.", status=403)
+            return handle_error("You can only claim your own approved requests.", status.HTTP_403_FORBIDDEN)
+
+        with transaction.atomic():
+            # Lock the donation, then the request, in the order approvals do, and write back only
+            # the changed fields so an approval's quantity decrement is never overwritten.
+            donation = Donation.objects.select_for_update().get(pk=request_obj.donation_id)
+            request_obj = Request.objects.select_for_update().get(pk=pk)
 
-        # Ensure the request is approved before marking as claimed
-        if request_obj.status != 'APPROVED':
-            return handle_error("Only approved requests can be marked as claimed.", status=400)
+            # Ensure the request is approved before marking as claimed
+            if request_obj.status != 'APPROVED':
+                return handle_error("Only approved requests can be marked as claimed.", status.HTTP_400_BAD_REQUEST)
 
-        # Mark request as claimed
-        request_obj.status = 'CLAIMED'
-        request_obj.save()
+            # Mark request as claimed
+            request_obj.status = 'CLAIMED'
+            request_obj.save(update_fields=['status', 'updated_at'])
 
-        # Check if all approved requests for this donation are now claimed
-        donation = request_obj.donation
-        all_claimed = not donation.requests.filter(status='APPROVED').exists()
+            # Check if all approved requests for this donation are now claimed
+            all_claimed = not donation.requests.filter(status='APPROVED').exists()
 
-        if all_claimed:
-            donation.status = 'CLAIMED'  # Mark donation as fully claimed
-            donation.save()
+            if all_claimed:
+                donation.status = 'CLAIMED'  # Mark donation as fully claimed
+                donation.save(update_fields=['status', 'updated_at'])
 
-        logger.info(f"Request ID={request_obj.id} for donation '{donation.item_name}' has been marked as claimed.")
+        logger.info("Request ID=%s for donation '%s' has been marked as claimed.", request_obj.id, donation.item_name)
 
         return Response({"message": "Item successfully claimed!"}, status=200)
@@ -0,0 +1,85 @@
+import logging
+from django.conf import settings
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..models import Upload
+from ..serializers import UploadSerializer
+from ..uploads import append_chunk, create_part_file, discard, file_sha256, is_image
+from .base import handle_error
+
+logger = logging.getLogger(__name__)
+
+
+class UploadCreateView(APIView):
+    """
+    Start a resumable upload. Send ``filename``, ``size`` and ``sha256``; the
+    response carries the upload ``id`` to send chunks to.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = UploadSerializer(data=request.data)
+        if serializer.is_valid():
+            upload = serializer.save(user=request.user)
+            create_part_file(upload)
+            data = dict(serializer.data, chunk_size=settings.UPLOADS['CHUNK_SIZE'])
+            return Response(data, status=status.HTTP_201_CREATED)
+        return handle_error(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+
+class UploadDetailView(APIView):
+    """
+    GET reports how many bytes have been received (the offset to resume from).
+    PATCH appends the raw request body at the offset given in the
+    ``Upload-Offset`` header. DELETE abandons the upload.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        upload = get_object_or_404(Upload, pk=pk, user=request.user)
+        return Response(UploadSerializer(upload).data, status=status.HTTP_200_OK)
+
+    def patch(self, request, pk):
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+            length = int(request.headers.get("Content-Length", ""))
+        except ValueError:
+            return handle_error("Upload-Offset and Content-Length headers are required.", status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # Serialize chunks of the same upload; the row lock is held while the chunk is written.
+            upload = get_object_or_404(Upload.objects.select_for_update(), pk=pk, user=request.user)
+
+            if upload.status == "COMPLETE":
+                return handle_error("This upload is already complete.", status.HTTP_409_CONFLICT)
+            if offset != upload.received:
+                return Response(
+                    {"error": "Offset does not match the bytes received.", "received": upload.received},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            if length > settings.UPLOADS["MAX_CHUNK_SIZE"] or offset + length > upload.size:
+                return handle_error("Chunk is too large.", status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+            upload.received += append_chunk(upload, request.stream, length)
+            if upload.received == upload.size:
+                if file_sha256(upload.path) != upload.sha256:
+                    upload.received = 0
+                    upload.save(update_fields=["received"])
+                    return handle_error("Checksum mismatch; the upload was restarted.", status.HTTP_400_BAD_REQUEST)
+                if not is_image(upload.path):
+                    discard(upload)
+                    return handle_error("The uploaded file is not a valid image.", status.HTTP_400_BAD_REQUEST)
+                upload.status = "COMPLETE"
+            upload.save(update_fields=["received", "status"])
+
+        return Response(UploadSerializer(upload).data, status=status.HTTP_200_OK)
+
+    def delete(self, request, pk):
+        upload = get_object_or_404(Upload, pk=pk, user=request.user)
+        discard(upload)
+        return Response({"message": "Upload deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
@@ -3,10 +3,19 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from ..authentication import lock_current_user
+from ..cache import dashboard_cache
+from ..counters import adjust_pending_counters
+from ..events import publish, request_event
 from ..models import Donation, Request
 from ..serializers import DonationSerializer, RequestSerializer, UserSerializer
-from .base import handle_error
+from .base import (
+    AsyncAPIView, evaluate_preconditions, handle_error, has_preconditions, make_validators, set_validators,
+)
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -14,109 +23,206 @@ User = get_user_model()
 
 class UserDashboardView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 7}  # On a cache miss
 
     def get(self, request):
         """
         Retrieve donations and requests associated with the logged-in user.
+        Served from the per-user dashboard cache; writes to related donations and
+        requests invalidate it (see kindness.signals).
         """
-        user = request.user
+        data, hit = dashboard_cache.get_or_build(
+            request.user.pk, lambda: self.build_dashboard(request)
+        )
+        response = Response(data, status=status.HTTP_200_OK)
+        response["X-Cache"] = "HIT" if hit else "MISS"
+        return response
+
+    def build_dashboard(self, request):
+        user_donations, user_requests = self.dashboard_querysets(request.user)
+        return self.serialize_dashboard(request, user_donations, user_requests)
 
+    @staticmethod
+    def dashboard_querysets(user):
         # Fetch the donations made by the user
-        user_donations = Donation.objects.filter(donor=user).prefetch_related('requests__user')
+        user_donations = Donation.objects.filter(donor=user).with_related().prefetch_related('requests__user')
 
         # Fetch the requests made by the user
-        user_requests = Request.objects.filter(user=user).select_related('donation', 'donation__donor')
+        user_requests = Request.objects.filter(user=user).with_related()
+        return user_donations, user_requests
+
+    @staticmethod
+    def serialize_dashboard(request, user_donations, user_requests):
+        context = {"request": request}
+        user_donations, user_requests = list(user_donations), list(user_requests)
+        incoming_requests = [list(donation.requests.all()) for donation in user_donations]
+
+        # One serializer per list: building a ModelSerializer's fields costs more
+        # than rendering a single object, so never instantiate one per item.
+        donations_data = DonationSerializer(user_donations, many=True, context=context).data
+        requesters_data = iter(UserSerializer(
+            [req.user for requests in incoming_requests for req in requests], many=True, context=context
+        ).data)
+        requested_data = DonationSerializer([req.donation for req in user_requests], many=True, context=context).data
 
         data = {
             "donations": [
                 {
-                    "donation": DonationSerializer(donation, context={"request": request}).data,
+                    "donation": donation_data,
                     "requests": [
                         {
                             "id": req.id,
-                            "user": UserSerializer(req.user, context={"request": request}).data,
+                            "user": next(requesters_data),
                             "requested_quantity": req.requested_quantity,
                             "comments": req.comments,
                         }
-                        for req in donation.requests.all()
+                        for req in requests
                     ],
                 }
-                for donation in user_donations
+                for donation_data, requests in zip(donations_data, incoming_requests)
             ],
             "requests": [
                 {
                     "id": req.id,
-                    "donation": DonationSerializer(req.donation, context={"request": request}).data,
+                    "donation": donation_data,
                     "status": req.status,
                     "requested_quantity": req.requested_quantity,
                     "comments": req.comments,
                 }
-                for req in user_requests
+                for req, donation_data in zip(user_requests, requested_data)
             ],
         }
+        return data
 
-        return Response(data, status=status.HTTP_200_OK)
+    MODERATION_MESSAGES = {
+        "approve": "Request approved successfully.",
+        "reject": "Request rejected successfully.",
+    }
 
+    @transaction.atomic
     def post(self, request):
         """
-        Handle actions like approving/rejecting requests for the user's donations.
+        Approve or reject requests for the user's donations.
+
+        Send ``request_id`` for a single request, or ``request_ids`` to moderate
+        many in one call; the batch reports a result per request. Donations and
+        requests are locked with SELECT ... FOR UPDATE, so concurrent approvals
+        always see the current quantity. Status changes and the notification
+        counters are committed together.
         """
         action = request.data.get("action")
-        request_id = request.data.get("request_id")
+        request_ids = request.data.get("request_ids")
+        single = request_ids is None
 
         if action not in ["approve", "reject"]:
             return handle_error("Invalid action specified.", status.HTTP_400_BAD_REQUEST)
 
+        if single:
+            request_ids = [request.data.get("request_id")]
+        if not isinstance(request_ids, list) or not 0 < len(request_ids) <= settings.BULK_MODERATION_MAX_ITEMS:
+            return handle_error(
+                f"request_ids must be a list of 1 to {settings.BULK_MODERATION_MAX_ITEMS} IDs.",
+                status.HTTP_400_BAD_REQUEST,
+            )
         try:
-            donation_request = Request.objects.select_related("donation").get(
-                id=request_id, donation__donor=request.user
+            request_ids = [int(request_id) for request_id in request_ids]
+        except (TypeError, ValueError):
+            return handle_error("Request IDs must be integers.", status.HTTP_400_BAD_REQUEST)
+
+        donation_requests = self.lock_requests(request_ids, request.user)
+
+        results = []
+        for request_id in request_ids:
+            donation_request = donation_requests.get(request_id)
+            if donation_request is None:
+                error, code = "Request not found or not authorized.", status.HTTP_404_NOT_FOUND
+            else:
+                error, code = self.moderate(donation_request, action, donation_requests), status.HTTP_400_BAD_REQUEST
+            if single:
+                if error:
+                    return handle_error(error, code)
+                return Response({"message": self.MODERATION_MESSAGES[action]}, status=status.HTTP_200_OK)
+            results.append(
+                {"request_id": request_id, "status": "error", "error": error}
+                if error else
+                {"request_id": request_id, "status": donation_request.status}
             )
-        except Request.DoesNotExist:
-            return handle_error("Request not found or not authorized.", status.HTTP_404_NOT_FOUND)
 
+        return Response(
+            {
+                "processed": sum(1 for result in results if result["status"] != "error"),
+                "results": results,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    def lock_requests(self, request_ids, donor):
+        """
+        Lock the donations, then the requests, always in primary key order so
+        that concurrent batches cannot deadlock. Returns ``{id: request}`` with
+        each request's ``donation`` set to the shared locked instance.
+        """
+        donation_ids = set(
+            Request.objects.filter(id__in=request_ids, donation__donor=donor).values_list("donation_id", flat=True)
+        )
+        donations = {
+            donation.pk: donation
+            for donation in Donation.objects.select_for_update().filter(pk__in=donation_ids).order_by("pk")
+        }
+        donation_requests = {}
+        for donation_request in Request.objects.select_for_update().filter(
+            id__in=request_ids, donation_id__in=donations
+        ).order_by("pk"):
+            donation_request.donation = donations[donation_request.donation_id]
+            donation_requests[donation_request.pk] = donation_request
+        return donation_requests
+
+    def moderate(self, donation_request, action, donation_requests):
+        """Apply ``action`` to one locked request; returns an error message or None."""
         # Ensure the donation is still available
         donation = donation_request.donation
         if donation.status in ["CLOSED", "CLAIMED"]:
-            return handle_error("This donation is no longer available for requests.", status.HTTP_400_BAD_REQUEST)
-
-        if action == "approve":
-            if donation_request.status != "PENDING":
-                return handle_error("Request is already processed.", status.HTTP_400_BAD_REQUEST)
-
-            # Update the request status to approved
-            donation_request.status = "APPROVED"
-            donation_request.save()
-
-            # Subtract the requested quantity from the donation
-            donation.quantity -= donation_request.requested_quantity
-
-            # Close the donation if the quantity reaches zero
-            if donation.quantity <= 0:
-                donation.status = "CLOSED"
-            donation.save()
-
-            # Reject other pending requests for the same donation
-            Request.objects.filter(
-                donation=donation, status="PENDING"
-            ).exclude(id=donation_request.id).update(status="REJECTED")
-
-            return Response(
-                {"message": "Request approved successfully."}, 
-                status=status.HTTP_200_OK
-            )
+            return "This donation is no longer available for requests."
 
-        elif action == "reject":
-            if donation_request.status != "PENDING":
-                return handle_error("Request is already processed.", status.HTTP_400_BAD_REQUEST)
+        if donation_request.status != "PENDING":
+            return "Request is already processed."
 
-            # Update the request status to rejected
+        if action == "reject":
             donation_request.status = "REJECTED"
-            donation_request.save()
-
-            return Response(
-                {"message": "Request rejected successfully."}, 
-                status=status.HTTP_200_OK
-            )
+            donation_request.save(update_fields=["status", "updated_at"])
+            return None
+
+        donation_request.status = "APPROVED"
+        donation_request.save(update_fields=["status", "updated_at"])
+
+        # Subtract the requested quantity from the donation; the row is locked, so this is current
+        donation.quantity = max(donation.quantity - donation_request.requested_quantity, 0)
+
+        # Close the donation if the quantity reaches zero
+        if donation.quantity == 0:
+            donation.status = "CLOSED"
+        donation.save(update_fields=["quantity", "status", "updated_at"])
+
+        self.reject_other_pending(donation, donation_request)
+        # Keep the locked copies in step so later items in the batch see the rejection
+        for other in donation_requests.values():
+            if other.donation_id == donation.pk and other.pk != donation_request.pk and other.status == "PENDING":
+                other.status = other._loaded_status = "REJECTED"
+        return None
+
+    def reject_other_pending(self, donation, approved_request):
+        """Reject the remaining PENDING requests for ``donation`` in one UPDATE."""
+        rejected = Request.objects.filter(
+            donation=donation, status="PENDING"
+        ).exclude(id=approved_request.id)
+        rejected_rows = list(rejected.values_list("id", "user_id"))
+        rejected_users = [user_id for _, user_id in rejected_rows]
+        rejected.update(status="REJECTED", updated_at=timezone.now())
+        # Bulk updates bypass the post_save signal
+        adjust_pending_counters([(user_id, donation.donor_id) for user_id in rejected_users], -1)
+        dashboard_cache.invalidate(rejected_users)
+        for rejected_id, user_id in rejected_rows:
+            publish([user_id], request_event("request.rejected", rejected_id, donation.id, "REJECTED"))
 
 
 class UserNotificationView(APIView):
@@ -124,53 +230,117 @@ class UserNotificationView(APIView):
     API View to fetch the notification counts for the authenticated user.
     """
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 2}
 
     def get(self, request):
         user = request.user
 
-        # Count pending requests on the user's donations
-        user_donations = Donation.objects.filter(donor=user)
-        pending_requests_count = Request.objects.filter(
-            donation__in=user_donations, status="PENDING"
-        ).count()
+        # Both counts are denormalized onto the user row (see kindness.counters),
+        # which the authentication step has already loaded, unless the user came
+        # from the authentication cache, which leaves them deferred.
+        if self.counters_deferred(user):
+            user.refresh_from_db(fields=User.COUNTER_FIELDS)
+        return self.counts(user)
 
-        # Count pending requests made by the user
-        pending_donations_count = Request.objects.filter(
-            user=user, status="PENDING"
-        ).count()
+    @staticmethod
+    def counters_deferred(user):
+        return not user.get_deferred_fields().isdisjoint(User.COUNTER_FIELDS)
 
+    @staticmethod
+    def counts(user):
         return Response(
             {
-                "pending_requests": pending_requests_count,
-                "pending_donations": pending_donations_count,
+                "pending_requests": user.pending_incoming_requests,
+                "pending_donations": user.pending_outgoing_requests,
             },
             status=200,
         )
 
 
+class AsyncUserDashboardView(AsyncAPIView):
+    """Async variant of UserDashboardView.get, sharing its cache and payload."""
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        data, hit = await dashboard_cache.aget_or_build(
+            request.user.pk, lambda: self.build_dashboard(request)
+        )
+        response = Response(data, status=status.HTTP_200_OK)
+        response["X-Cache"] = "HIT" if hit else "MISS"
+        return response
+
+    async def build_dashboard(self, request):
+        user_donations, user_requests = UserDashboardView.dashboard_querysets(request.user)
+        return UserDashboardView.serialize_dashboard(
+            request,
+            [donation async for donation in user_donations],
+            [req async for req in user_requests],
+        )
+
+
+class AsyncUserNotificationView(AsyncAPIView):
+    """Async variant of UserNotificationView."""
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        user = request.user
+        if UserNotificationView.counters_deferred(user):
+            await user.arefresh_from_db(fields=User.COUNTER_FIELDS)
+        return UserNotificationView.counts(user)
+
+
 class UserProfileView(APIView):
     """
     Fetch, update, and delete user profile.
     """
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 1}
 
     def get(self, request):
         """Fetch user profile data."""
         user = request.user
+        validators = make_validators(request, [(user.pk, user.updated_at)])
+        not_modified = evaluate_preconditions(request, *validators)
+        if not_modified is not None:
+            return not_modified
         serializer = UserSerializer(user)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return set_validators(Response(serializer.data, status=status.HTTP_200_OK), *validators)
 
     def put(self, request):
-        """Update user profile."""
-        user = request.user
-        serializer = UserSerializer(user, data=request.data, partial=True)
-        if serializer.is_valid():
+        """Update user profile. With If-Match, only if it is unchanged since the client fetched it."""
+        with transaction.atomic():
+            # Never save the cached request.user: it may hold another process's stale password and token version
+            user = lock_current_user(request)
+            if has_preconditions(request):
+                precondition_failed = evaluate_preconditions(
+                    request, *make_validators(request, [(user.pk, user.updated_at)])
+                )
+                if precondition_failed is not None:
+                    return precondition_failed
+            serializer = UserSerializer(user, data=request.data, partial=True)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        return set_validators(response, *make_validators(request, [(user.pk, user.updated_at)]))
 
     def delete(self, request):
         """Delete user account."""
-        user = request.user
-        user.delete()
+        with transaction.atomic():
+            lock_current_user(request).delete()
         return Response({"message": "Account deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
+
+
+class AsyncUserProfileView(AsyncAPIView):
+    """Async variant of UserProfileView.get."""
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        # request.user was loaded (or taken from the cache) by authentication; no query here.
+        user = request.user
+        validators = make_validators(request, [(user.pk, user.updated_at)])
+        not_modified = evaluate_preconditions(request, *validators)
+        if not_modified is not None:
+            return not_modified
+        serializer = UserSerializer(user)
+        return set_validators(Response(serializer.data, status=status.HTTP_200_OK), *validators)
@@ -19,7 +19,7 @@ const DonationsGrid = () => {
       try {
         const response = await api.get("api/donations/");
 
-        const donationsWithAbsoluteImages = response.map((donation) => ({
+        const donationsWithAbsoluteImages = response.results.map((donation) => ({
           ...donation,
           image: donation.image.startsWith("http")
             ? donation.image